@@ -0,0 +1,842 @@
+# Regal Pro itinerary engine: the screening records, the per-day show graph, the Smart
+# Scheduler searches and multi-day planning. Nothing here touches Streamlit, so planning
+# workers and tests can import it without running the app.
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, time as dt_time
+
+class StringTable:
+    # Process-wide string <-> small int id mapping, so records can carry ids instead of strings
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+        self.lock = threading.Lock()
+
+    def intern(self, value):
+        sid = self.ids.get(value)
+        if sid is None:
+            with self.lock:
+                sid = self.ids.get(value)
+                if sid is None:
+                    sid = len(self.values)
+                    self.values.append(value)
+                    self.ids[value] = sid
+        return sid
+
+# (strings, attribute names), one pair per process; an attribute's id is its bit in Screening.attr_mask
+STRINGS, ATTRIBUTE_NAMES = StringTable(), StringTable()
+EPOCH = datetime(2000, 1, 1)
+
+def to_minutes(dt):
+    return int((dt - EPOCH).total_seconds()) // 60
+
+def from_minutes(minutes):
+    return EPOCH + timedelta(minutes=minutes)
+
+class Screening:
+    # One performance. start/end are minutes since EPOCH, the string fields are STRINGS ids
+    # and attr_mask has one bit per ATTRIBUTE_NAMES id, so scheduler checks are integer ops.
+    __slots__ = ("start", "end", "duration", "theater_id", "title_id", "rating_id",
+                 "screen_id", "auditorium_id", "movie_id", "attr_mask")
+
+    def __init__(self, start, duration, theater_id, title_id, rating_id, screen_id, auditorium_id, movie_id, attr_mask):
+        self.start = start
+        self.end = start + duration
+        self.duration = duration
+        self.theater_id = theater_id
+        self.title_id = title_id
+        self.rating_id = rating_id
+        self.screen_id = screen_id
+        self.auditorium_id = auditorium_id
+        self.movie_id = movie_id
+        self.attr_mask = attr_mask
+
+    @property
+    def showtime(self):
+        return from_minutes(self.start)
+
+    @property
+    def end_time(self):
+        return from_minutes(self.end)
+
+    @property
+    def theater_code(self):
+        return STRINGS.values[self.theater_id]
+
+    @property
+    def title(self):
+        return STRINGS.values[self.title_id]
+
+    @property
+    def rating(self):
+        return STRINGS.values[self.rating_id]
+
+    @property
+    def screen_type(self):
+        return STRINGS.values[self.screen_id]
+
+    @property
+    def auditorium(self):
+        return STRINGS.values[self.auditorium_id]
+
+    @property
+    def master_code(self):
+        return STRINGS.values[self.movie_id]
+
+    @property
+    def raw_attrs(self):
+        mask, names = self.attr_mask, ATTRIBUTE_NAMES.values
+        return {names[i] for i in range(mask.bit_length()) if mask >> i & 1}
+
+    @property
+    def attributes(self):
+        return ", ".join(sorted(self.raw_attrs))
+
+def title_ids(titles):
+    # STRINGS ids for scheduler titles, which is what the search keys titles by; a title no
+    # payload has interned maps to None and matches nothing
+    return [STRINGS.ids.get(t) for t in titles]
+
+def build_screening_index(screenings):
+    # Title id -> (theater id, screen type id) -> (shows, start times), each bucket sorted by start
+    index = {}
+    for s in screenings:
+        index.setdefault(s.title_id, {}).setdefault((s.theater_id, s.screen_id), []).append(s)
+
+    for buckets in index.values():
+        for key, shows in buckets.items():
+            shows.sort(key=lambda x: x.start)
+            buckets[key] = (shows, [s.start for s in shows])
+    return index
+
+def get_search_window(p, selected_date):
+    # (start, end) of the allowed window in minutes since EPOCH
+    window_start = to_minutes(datetime.combine(selected_date, p['start']))
+    window_end = to_minutes(datetime.combine(selected_date, p['end']))
+
+    if window_end <= window_start:
+        window_end += 24 * 60
+    elif p['end'] == dt_time(23, 59):
+        window_end += 6 * 60
+    return window_start, window_end
+
+def get_search_filter(p):
+    # (theater ids, screen type ids) for p['theaters'] and p['formats'], so the search tests
+    # index buckets with integer set lookups; no formats means any format (None)
+    theaters = {STRINGS.ids[code] for code in p['theaters'] if code in STRINGS.ids}
+    formats = {STRINGS.ids[fmt] for fmt in p['formats'] if fmt in STRINGS.ids} if p['formats'] else None
+    return theaters, formats
+
+def bucket_allowed(key, allowed):
+    theaters, formats = allowed
+    return key[0] in theaters and (formats is None or key[1] in formats)
+
+MAX_GAP_CAP = 240
+
+class DayGraph:
+    # Compatibility DAG over one day's screenings. The edges out of a show are built once, on
+    # first use, for the loosest settings the Scheduler allows (no buffer, fudge on, the
+    # largest Max Gap) and annotated with gap minutes, drive minutes and miles. Searches only
+    # re-filter them, so changing Buffer, Max Gap or the Unlimited rule reuses the graph.
+    def __init__(self, screenings, primary_code, drive_map):
+        self.screenings = screenings
+        self.index = build_screening_index(screenings)
+        self.primary_code = primary_code
+        self.drive_map = drive_map
+        self.edges = {}
+
+    def drive(self, from_code, to_code):
+        # (minutes, miles) between two theaters in the cluster
+        return self.drive_map.drive(from_code, to_code)
+
+    def transition(self, u, v):
+        # (gap, drive minutes, miles) for going from show u to show v
+        return (v.start - u.end,) + self.drive(u.theater_code, v.theater_code)
+
+    def out_edges(self, u):
+        # Title id -> [((theater id, screen type id), drive, miles, gaps, shows)], gaps ascending
+        if u not in self.edges:
+            u_code = u.theater_code
+            out = {}
+            for title, buckets in self.index.items():
+                for key, (shows, starts) in buckets.items():
+                    i, j = bisect_left(starts, u.end - 5), bisect_right(starts, u.end + MAX_GAP_CAP)
+                    if i < j:
+                        gaps = [v.start - u.end for v in shows[i:j]]
+                        out.setdefault(title, []).append((key,) + self.drive(u_code, STRINGS.values[key[0]]) + (gaps, shows[i:j]))
+            self.edges[u] = out
+        return self.edges[u]
+
+def iter_next_shows(prev, depth, remaining_titles, graph, p, window, allowed):
+    # Yields (title id, show, gap, miles) for every show that can legally follow prev, the last
+    # of `depth` shows already on the path (prev is None for the first show). remaining_titles
+    # are title ids and allowed is get_search_filter(p).
+    window_start, window_end = window
+    theaters, formats = allowed
+
+    if not prev:
+        for title in remaining_titles:
+            for (t_id, s_id), (shows, starts) in graph.index.get(title, {}).items():
+                if t_id not in theaters or (formats is not None and s_id not in formats):
+                    continue
+                for i in range(bisect_left(starts, window_start), bisect_right(starts, window_end)):
+                    s = shows[i]
+                    if s.end <= window_end:
+                        yield title, s, 0, 0
+        return
+
+    fudge = 5 if p['fudge'] else 0
+    req_buffer = p['long_buffer'] if p['break_after'] == depth else p['buffer']
+    max_gap = min(p['gap_cap'], MAX_GAP_CAP) - fudge
+    edges = graph.out_edges(prev)
+
+    for title in remaining_titles:
+        for (t_id, s_id), drive_time, miles, gaps, shows in edges.get(title, ()):
+            if t_id not in theaters or (formats is not None and s_id not in formats):
+                continue
+
+            min_gap = drive_time + req_buffer - fudge
+            if p['unlimited']:
+                min_gap = max(min_gap, 91 - prev.duration)
+
+            for i in range(bisect_left(gaps, min_gap), bisect_right(gaps, max_gap)):
+                s = shows[i]
+                if s.start < window_start or s.end > window_end:
+                    continue
+                yield title, s, gaps[i], miles
+
+def iter_itineraries(current_path, remaining_titles, screenings, p, selected_date, drive_map):
+    # Yields every maximal path, walking the tree with one shared path and one frame per level.
+    # Only yielded paths are copied. The order is depth-first with each step's next shows taken
+    # title by title, then by (theater, format) bucket and start time, so it is not the
+    # screening-list order of the old recursive search even though the set of paths is the same.
+    max_per_day = p.get('max_per_day', 99)
+    if len(current_path) >= max_per_day:
+        return
+    if isinstance(screenings, list):
+        screenings = DayGraph(screenings, p['primary_code'], drive_map)
+
+    window, allowed = get_search_window(p, selected_date), get_search_filter(p)
+    titles = title_ids(remaining_titles)
+    used = set()
+    path = list(current_path)
+
+    def expand():
+        # Titles are filtered lazily, so a suspended frame sees `used` as it was when it was pushed
+        return iter_next_shows(path[-1] if path else None, len(path), (t for t in titles if t not in used), screenings, p, window, allowed)
+
+    # Each frame is [next shows, has a child, title that was appended to reach it]
+    frames = [[expand(), False, None]]
+    while frames:
+        frame = frames[-1]
+        step = next(frame[0], None)
+        if step is None:
+            frames.pop()
+            if not frame[1] and path:
+                yield list(path)
+            if frame[2] is not None:
+                path.pop()
+                used.discard(frame[2])
+            continue
+
+        frame[1] = True
+        title, s, _, _ = step
+        path.append(s)
+        used.add(title)
+        if len(path) >= max_per_day:
+            yield list(path)
+            path.pop()
+            used.discard(title)
+        else:
+            frames.append([expand(), False, title])
+
+def find_itineraries(current_path, remaining_titles, screenings, p, selected_date, drive_map):
+    return list(iter_itineraries(current_path, remaining_titles, screenings, p, selected_date, drive_map))
+
+def itinerary_id(path):
+    # What an itinerary shows the user: which movie starts where and when. Paths that differ only
+    # in format or auditorium share an id and score the same.
+    return tuple((s.theater_id, s.movie_id, s.start) for s in path)
+
+def get_step_score(prev, s, gap, miles):
+    # Score gained by appending s after prev, using the calculate_path_score weights
+    score = 250
+    if prev:
+        score -= gap * 0.1
+        if s.theater_id != prev.theater_id:
+            score -= 40 + miles * 2
+    return score
+
+def find_top_itineraries(remaining_titles, screenings, p, selected_date, drive_map, k=5, rank="score",
+                         required=(), single_theater=False, start_path=(), stats=None, stop=None, on_update=None,
+                         anchor=None):
+    # Branch-and-bound over the find_itineraries tree. Only maximal paths are kept, ranked by
+    # (score, -gap) or, with rank="count", by (count, score). A subtree is cut as soon as its
+    # optimistic bound (250 per title that could still fit, minus friction already incurred)
+    # cannot beat the k-th best path found so far. Setting the `stop` Event ends the search with
+    # the best paths found so far, and on_update receives the ranked list each time it improves.
+    # The top k holds one path per itinerary_id, so k searches return k distinct itineraries.
+    # With an anchor show, only paths through it count: until it is on the path the children are
+    # the shows that end a buffer before it and the anchor itself (gap >= drive + buffer).
+    if isinstance(screenings, list):
+        screenings = DayGraph(screenings, p['primary_code'], drive_map)
+
+    window, allowed = get_search_window(p, selected_date), get_search_filter(p)
+    max_per_day = p.get('max_per_day', 99)
+    primary_code = p['primary_code']
+    remaining_titles = [t for t in title_ids(remaining_titles) if anchor is None or t != anchor.title_id]
+    required = set(title_ids(required))
+    top = []
+    top_ids = set()
+    seq = itertools.count()
+
+    # Smallest gap any transition may have, and per title the shortest runtime and latest start
+    # among the shows the search is allowed to use
+    min_gap = min(p['buffer'], p['long_buffer']) if p['break_after'] else p['buffer']
+    if p['fudge']:
+        min_gap -= 5
+    step_bound = 250 - min_gap * 0.1
+    title_limits = {}
+    for title in remaining_titles:
+        for key, (shows, _) in screenings.index.get(title, {}).items():
+            if not bucket_allowed(key, allowed):
+                continue
+            for s in shows:
+                if s.start < window[0] or s.end > window[1]:
+                    continue
+                duration, last_start = title_limits.get(title, (s.duration, s.start))
+                title_limits[title] = (min(duration, s.duration), max(last_start, s.start))
+
+    def path_key(path):
+        stats_ = calculate_path_score(path, primary_code, drive_map)
+        if rank == "count":
+            return (stats_['count'], stats_['score'])
+        return (stats_['score'], -stats_['gap'])
+
+    # Longest run of shows that can follow a show when titles may repeat and every
+    # transition gets the smallest buffer; an upper bound on how many more movies fit
+    relaxed_p = dict(p, buffer=min_gap + (5 if p['fudge'] else 0), break_after=None)
+    chain_lengths = {}
+
+    def chain_length(s):
+        key = id(s)
+        if key not in chain_lengths:
+            chain_lengths[key] = 1 + max((chain_length(nxt) for _, nxt, _, _ in iter_next_shows(s, 1, remaining_titles, screenings, relaxed_p, window, allowed)), default=0)
+        return chain_lengths[key]
+
+    def anchor_pending(path):
+        return anchor is not None and (not path or path[-1].start < anchor.start)
+
+    def bound_key(path, remaining, score):
+        # Fit the shortest remaining titles that still have a late enough show into the time left
+        earliest_start = path[-1].end + min_gap
+        slack = window[1] - path[-1].end
+        pending = anchor_pending(path)
+        if pending:
+            # chain_length leaves out the anchor's title, so it misses every chain through the
+            # anchor; the anchor itself is counted below
+            max_extra = max_per_day - len(path) - 1
+        else:
+            max_extra = min(max_per_day - len(path), chain_length(path[-1]) - 1)
+        extra = 0
+        for duration in sorted(title_limits[t][0] for t in remaining if t in title_limits and title_limits[t][1] >= earliest_start):
+            slack -= duration + min_gap
+            if slack < 0 or extra >= max_extra:
+                break
+            extra += 1
+        if pending:
+            extra += 1
+
+        best_score = score + extra * step_bound + 1e-6
+        if rank == "count":
+            return (len(path) + extra, best_score)
+        return (best_score, math.inf)
+
+    def expand(path, remaining, score):
+        if stop is not None and stop.is_set():
+            return
+        if stats is not None:
+            stats['nodes'] = stats.get('nodes', 0) + 1
+
+        children = []
+        is_leaf = True
+        pending = anchor_pending(path)
+        if len(path) < max_per_day:
+            prev = path[-1] if path else None
+            for title, s, gap, miles in iter_next_shows(prev, len(path), remaining, screenings, p, window, allowed):
+                if pending and (s.end > anchor.start - p['buffer'] or len(path) + 1 >= max_per_day):
+                    continue
+                is_leaf = False
+                if single_theater and path and s.theater_id != path[0].theater_id:
+                    continue
+                children.append((score + get_step_score(prev, s, gap, miles), title, s))
+
+            if pending:
+                gap, travel, miles = screenings.transition(prev, anchor) if prev else (0, 0, 0)
+                if gap >= travel + p['buffer']:
+                    is_leaf = False
+                    if not (single_theater and path and anchor.theater_id != path[0].theater_id):
+                        children.append((score + get_step_score(prev, anchor, gap, miles), anchor.title_id, anchor))
+
+        if is_leaf:
+            if path and not pending and required <= {s.title_id for s in path}:
+                path_id = itinerary_id(path)
+                if path_id in top_ids:
+                    return
+                entry = (path_key(path), next(seq), path)
+                if len(top) < k:
+                    heapq.heappush(top, entry)
+                elif entry[0] > top[0][0]:
+                    top_ids.discard(itinerary_id(heapq.heapreplace(top, entry)[2]))
+                else:
+                    return
+                top_ids.add(path_id)
+                if on_update:
+                    on_update([path for _, _, path in sorted(top, reverse=True)])
+            return
+
+        children.sort(key=lambda c: -c[0])
+        for child_score, title, s in children:
+            child_path = path + [s]
+            child_remaining = [t for t in remaining if t != title]
+            if len(required - {x.title_id for x in child_path}) > max_per_day - len(child_path):
+                continue
+            if len(top) == k and bound_key(child_path, child_remaining, child_score) < top[0][0]:
+                continue
+            expand(child_path, child_remaining, child_score)
+
+    start_path = list(start_path)
+    expand(start_path, remaining_titles, calculate_path_score(start_path, primary_code, drive_map)['score'] if start_path else 0)
+    return [path for _, _, path in sorted(top, reverse=True)]
+
+DP_MAX_TITLES = 12
+# Default wall-clock limit in seconds for the Smart Scheduler searches
+SEARCH_TIME_LIMIT = 10
+
+def find_itineraries_dp(current_path, remaining_titles, screenings, p, selected_date, drive_map, rank="score"):
+    # Exact best maximal itinerary by memoized DP over (last show, bitmask of titles already used),
+    # ranked like find_top_itineraries. Same call signature as find_itineraries, but only the
+    # winning path is returned. Larger selections fall back to the branch-and-bound search.
+    if isinstance(screenings, list):
+        screenings = DayGraph(screenings, p['primary_code'], drive_map)
+    if len(remaining_titles) > DP_MAX_TITLES:
+        return find_top_itineraries(remaining_titles, screenings, p, selected_date, drive_map, k=1, rank=rank, start_path=current_path)
+
+    window, allowed = get_search_window(p, selected_date), get_search_filter(p)
+    max_per_day = p.get('max_per_day', 99)
+    titles = title_ids(remaining_titles)
+    bits = {t: 1 << i for i, t in enumerate(titles)}
+    memo = {}
+    # Transitions out of a show only depend on the mask through which titles are still open
+    transitions = {}
+
+    def get_transitions(prev, depth):
+        key = (id(prev), p['break_after'] == depth)
+        if key not in transitions:
+            transitions[key] = [(bits[title], s, get_step_score(prev, s, gap, miles), gap)
+                                for title, s, gap, miles in iter_next_shows(prev, depth, titles, screenings, p, window, allowed)]
+        return transitions[key]
+
+    def best_tail(prev, depth, used):
+        # Best (rank value, linked tail) over every maximal continuation after prev
+        key = (id(prev), used)
+        if key in memo:
+            return memo[key]
+
+        best = None
+        if depth < max_per_day:
+            for bit, s, step_score, step_gap in get_transitions(prev, depth):
+                if used & bit:
+                    continue
+                tail_value, tail = best_tail(s, depth + 1, used | bit)
+                if rank == "count":
+                    value = (tail_value[0] + 1, tail_value[1] + step_score)
+                else:
+                    value = (tail_value[0] + step_score, tail_value[1] - step_gap)
+                if best is None or value > best[0]:
+                    best = (value, (s, tail))
+
+        memo[key] = best or ((0, 0), None)
+        return memo[key]
+
+    _, tail = best_tail(current_path[-1] if current_path else None, len(current_path), 0)
+    if tail is None:
+        return [current_path] if current_path else []
+
+    path = list(current_path)
+    while tail:
+        path.append(tail[0])
+        tail = tail[1]
+    return [path]
+
+def find_day_options(titles, screenings, p, selected_date, drive_map):
+    # Best-scoring path for every set of titles that fits in the day, as {title bitmask: path}.
+    # Layered over (last show, titles used): a state reached twice keeps only its better score,
+    # since everything that can follow it is the same. Raises TimeoutError past p['deadline'].
+    if isinstance(screenings, list):
+        screenings = DayGraph(screenings, p['primary_code'], drive_map)
+
+    window, allowed = get_search_window(p, selected_date), get_search_filter(p)
+    deadline = p.get('deadline')
+    titles = title_ids(titles)
+    bits = {t: 1 << i for i, t in enumerate(titles)}
+    options = {}
+    layer = {(None, 0): (0, ())}
+
+    for depth in range(min(p.get('max_per_day', 99), len(titles))):
+        next_layer = {}
+        for (prev, used), (score, path) in layer.items():
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError
+            open_titles = [t for t in titles if not used & bits[t]]
+            for title, s, gap, miles in iter_next_shows(prev, depth, open_titles, screenings, p, window, allowed):
+                key = (s, used | bits[title])
+                step = score + get_step_score(prev, s, gap, miles)
+                if key not in next_layer or step > next_layer[key][0]:
+                    next_layer[key] = (step, path + (s,))
+
+        for (_, used), (score, path) in next_layer.items():
+            if used not in options or score > options[used][0]:
+                options[used] = (score, path)
+        layer = next_layer
+
+    return {used: list(path) for used, (_, path) in options.items()}
+
+def find_candidate_itineraries(target_movies, screenings, p, selected_date, drive_map, k=5, stats=None,
+                               stop=None, on_update=None, anchor=None):
+    # Union of the bounded searches behind each Smart Scheduler category. Each category's pick
+    # among these is the same as its pick among every path find_itineraries would return.
+    # stop, on_update and anchor are passed through to find_top_itineraries, with on_update
+    # getting the union.
+    if isinstance(screenings, list):
+        screenings = DayGraph(screenings, p['primary_code'], drive_map)
+
+    titles = [t for t in target_movies if not anchor or t != anchor.title]
+    args = (titles, screenings, p, selected_date, drive_map)
+    searches = [dict(k=k), dict(k=1, rank="count"), dict(k=1, single_theater=True)]
+    if len(target_movies) >= 2:
+        searches.append(dict(k=1, required=target_movies[:2]))
+
+    def unique(paths):
+        seen = {}
+        for path in paths:
+            seen.setdefault(itinerary_id(path), path)
+        return list(seen.values())
+
+    candidates = []
+    for search in searches:
+        publish = (lambda paths: on_update(unique(candidates + paths))) if on_update else None
+        candidates += find_top_itineraries(*args, **search, stats=stats, stop=stop, on_update=publish, anchor=anchor)
+    return unique(candidates)
+
+class ResultCollector:
+    # The Smart Scheduler result categories, filled in one pass over the paths with a bounded heap
+    # each (top k by score, best by count, best single-theater, best with the two priority titles).
+    # Keys end in the negated arrival order so ties go to the earlier path, like a stable sort.
+    def __init__(self, primary_code, drive_map, priority_titles=(), k=5):
+        self.primary_code = primary_code
+        self.drive_map = drive_map
+        self.priority_titles = set(title_ids(priority_titles))
+        self.k = k
+        self.seq = itertools.count()
+        self.heaps = {"ranked": [], "count": [], "single": [], "priority": []}
+        self.sizes = {"ranked": k, "count": 1, "single": 1, "priority": 1}
+        # Paths with the same id score the same, so the ranked heap keeps the first of them only
+        self.ranked_ids = set()
+
+    def push(self, name, key, entry):
+        heap = self.heaps[name]
+        unique = name == "ranked"
+        if unique and entry['id'] in self.ranked_ids:
+            return
+        if len(heap) < self.sizes[name]:
+            heapq.heappush(heap, (key, entry))
+        elif key > heap[0][0]:
+            _, evicted = heapq.heapreplace(heap, (key, entry))
+            if unique:
+                self.ranked_ids.discard(evicted['id'])
+        else:
+            return
+        if unique:
+            self.ranked_ids.add(entry['id'])
+
+    def add(self, path):
+        stats = calculate_path_score(path, self.primary_code, self.drive_map)
+        n = -next(self.seq)
+        entry = {
+            'path': path,
+            'count': stats['count'],
+            'hops': stats['hops'],
+            'miles': stats['miles'],
+            'score': stats['score'],
+            'total_gap': stats['gap'],
+            'id': itinerary_id(path)
+        }
+        self.push("ranked", (stats['score'], -stats['gap'], n), entry)
+        self.push("count", (stats['count'], stats['score'], n), entry)
+        if stats['hops'] == 0:
+            self.push("single", (stats['score'], n), entry)
+        if self.priority_titles and self.priority_titles <= {s.title_id for s in path}:
+            self.push("priority", (stats['score'], n), entry)
+
+    def best(self, name):
+        return [entry for _, entry in sorted(self.heaps[name], key=lambda x: x[0], reverse=True)]
+
+    def selections(self):
+        # [(entry, label)]: one pick per category, then the next best by score, k at most
+        final_selections = []
+        seen_ids = set()
+
+        def add_selection(entry, label):
+            if entry['id'] not in seen_ids:
+                final_selections.append((entry, label))
+                seen_ids.add(entry['id'])
+
+        ranked = self.best("ranked")
+        labels = [("ranked", "Smart Marathon (Best Efficiency)"), ("count", "Absolute Marathon (Max Movies)"),
+                  ("single", "Single-Theater Max (Zero Hops)"), ("priority", "Priority Movie Match (#1 & #2)")]
+        for name, label in labels:
+            for entry in self.best(name)[:1]:
+                add_selection(entry, label)
+        for entry in ranked:
+            if len(final_selections) >= self.k: break
+            add_selection(entry, "Alternative Optimized Path")
+        return final_selections[:self.k]
+
+class SearchJob:
+    # find_candidate_itineraries on a background thread. `paths` always holds the best candidates
+    # found so far and `collector` the ResultCollector over them; the search ends early once
+    # Cancel or the time limit sets `stop`.
+    def __init__(self, target_movies, screenings, p, selected_date, drive_map, anchor=None):
+        self.primary_code = p['primary_code']
+        self.drive_map = drive_map
+        self.priority_titles = target_movies[:2] if len(target_movies) >= 2 else ()
+        self.stop = threading.Event()
+        self.paths = []
+        self.collector = ResultCollector(self.primary_code, drive_map, self.priority_titles)
+        self.stats = {}
+        self.timed_out = False
+        self.started = time.monotonic()
+        self.timer = threading.Timer(p.get('time_limit', SEARCH_TIME_LIMIT), self.expire)
+        self.thread = threading.Thread(target=self.run, args=(target_movies, screenings, p, selected_date, drive_map, anchor),
+                                       name="regal-search", daemon=True)
+        self.timer.start()
+        self.thread.start()
+
+    def run(self, target_movies, screenings, p, selected_date, drive_map, anchor):
+        try:
+            self.update(find_candidate_itineraries(target_movies, screenings, p, selected_date, drive_map, stats=self.stats,
+                                                   stop=self.stop, on_update=self.update, anchor=anchor))
+        finally:
+            self.timer.cancel()
+
+    def update(self, paths):
+        # Runs on the search thread; the collector is swapped in whole so a poll never sees it half-filled
+        collector = ResultCollector(self.primary_code, self.drive_map, self.priority_titles)
+        for path in paths:
+            collector.add(path)
+        self.paths, self.collector = paths, collector
+
+    def expire(self):
+        self.timed_out = True
+        self.stop.set()
+
+    def cancel(self):
+        self.stop.set()
+
+    @property
+    def done(self):
+        return not self.thread.is_alive()
+
+def calculate_path_score(path, primary_code, drive_map):
+    movie_count = len(path)
+    hops, total_miles, total_gap, total_duration = 0, 0, 0, 0
+    
+    for i in range(len(path)):
+        s = path[i]
+        total_duration += s.duration
+        
+        if i < len(path) - 1:
+            nxt = path[i+1]
+            total_gap += nxt.start - s.end
+            
+            if s.theater_id != nxt.theater_id:
+                hops += 1
+                total_miles += drive_map.drive(s.theater_code, nxt.theater_code)[1]
+
+    score = (movie_count * 250) - (hops * 40) - (total_miles * 2) - (total_gap * 0.1)
+    return {
+        'score': score, 'count': movie_count, 'hops': hops, 
+        'miles': total_miles, 'gap': total_gap, 'duration': total_duration
+    }
+
+
+PLAN_WORKERS = os.cpu_count() or 1
+PLAN_STATE = (None, {})
+
+class DriveTable:
+    # A drive map cut down to its (minutes, miles) for every pair of a day's theaters, which is
+    # how planning workers receive one
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+    def drive(self, from_code, to_code):
+        return self.pairs.get((from_code, to_code), (20, 0))
+
+def run_search_unit(graphs, params, drive_map, unit):
+    # unit is (day, kind, titles): "count" is the top-5 by movie count, "dp" the exact
+    # best-by-count path, "options" the best path per title set and "all" every maximal path
+    # (as a generator, so it can be consumed as the paths are found)
+    d_str, kind, titles = unit
+    d_obj = datetime.strptime(d_str, '%m-%d-%Y').date()
+    if kind == "count":
+        return find_top_itineraries(titles, graphs[d_str], params, d_obj, drive_map, k=5, rank="count")
+    if kind == "dp":
+        return find_itineraries_dp([], titles, graphs[d_str], params, d_obj, drive_map, rank="count")
+    if kind == "options":
+        return list(find_day_options(titles, graphs[d_str], params, d_obj, drive_map).values())
+    return iter_itineraries([], titles, graphs[d_str], params, d_obj, drive_map)
+
+def search_unit_worker(token, day, unit):
+    # Runs one unit on a planning worker. day is the unit's day as plain data (see
+    # DaySearchPool.ship); the DayGraph rebuilt from it is kept for the rest of the plan `token`.
+    global PLAN_STATE
+    strings, fields, primary_code, params, pairs = day
+    known = STRINGS.values
+    if strings[:len(known)] != known:
+        # The app's table was rebuilt since this worker last synced, so start again from its copy
+        STRINGS.ids.clear()
+        known.clear()
+        PLAN_STATE = (None, {})
+    for value in strings[len(known):]:
+        STRINGS.intern(value)
+
+    if PLAN_STATE[0] != token:
+        PLAN_STATE = (token, {})
+    graphs = PLAN_STATE[1]
+    if unit[0] not in graphs:
+        graphs[unit[0]] = DayGraph([Screening(*f) for f in fields], primary_code, DriveTable(pairs))
+    graph = graphs[unit[0]]
+    position = {id(s): i for i, s in enumerate(graph.screenings)}
+    return [[position[id(s)] for s in path] for path in run_search_unit(graphs, params, graph.drive_map, unit)]
+
+def make_plan_pool():
+    # A process pool for DaySearchPool, or None on a single core. Workers are spawned, not forked
+    # out of a multi-threaded server, and only start once units are submitted.
+    if PLAN_WORKERS < 2:
+        return None
+    return ProcessPoolExecutor(max_workers=PLAN_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+class DaySearchPool:
+    # Runs batches of per-day search units on a make_plan_pool executor. Its workers have their
+    # own string table, so each unit ships its day as plain tuples and strings, and paths come
+    # back as positions in the day's screening list. Units run in this process when there is no
+    # executor, and for the rest of the plan once it breaks, with the error kept in
+    # stats['pool_error']. An exception raised by a search itself propagates as it would here.
+    def __init__(self, graphs, params, drive_map, executor=None, stats=None):
+        self.graphs = graphs
+        self.state = (graphs, params, drive_map)
+        self.executor = executor
+        self.stats = {} if stats is None else stats
+        self.token = (os.getpid(), id(self), time.monotonic_ns())
+        self.shipped = {}
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for future in self.futures:
+            future.cancel()
+
+    def ship(self, d_str):
+        # (strings, screening fields, primary code, params, drive pairs) for one day
+        if d_str not in self.shipped:
+            graphs, params, drive_map = self.state
+            graph = graphs[d_str]
+            codes = {graph.primary_code, params['primary_code'], *params['theaters']}
+            codes.update(s.theater_code for s in graph.screenings)
+            fields = [(s.start, s.duration, s.theater_id, s.title_id, s.rating_id, s.screen_id,
+                       s.auditorium_id, s.movie_id, s.attr_mask) for s in graph.screenings]
+            pairs = {(a, b): tuple(drive_map.drive(a, b)) for a in codes for b in codes}
+            self.shipped[d_str] = (list(STRINGS.values), fields, graph.primary_code, dict(params), pairs)
+        return self.shipped[d_str]
+
+    def map(self, units):
+        if len(units) < 2 or self.executor is None:
+            return [run_search_unit(*self.state, unit) for unit in units]
+        futures = []
+        try:
+            for unit in units:
+                futures.append(self.executor.submit(search_unit_worker, self.token, self.ship(unit[0]), unit))
+            self.futures.extend(futures)
+            results = [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            for future in futures:
+                future.cancel()
+            self.stats['pool_error'] = repr(e)
+            self.executor = None
+            return [run_search_unit(*self.state, unit) for unit in units]
+        return [[[self.graphs[unit[0]].screenings[i] for i in path] for path in paths] for unit, paths in zip(units, results)]
+
+# "Maximize Compactness" charges each day used like a theater hop, so a day is only split when
+# that saves more gap and travel than an extra trip costs
+COMPACTNESS_DAY_COST = 40
+
+def plan_days_exact(titles, days, graphs, params, drive_map, pool):
+    # Optimal assignment of title sets to days by DP over (days so far, titles used), built on each
+    # day's find_day_options pool. "Minimize Days" ranks plans by (movies, -days, score), "Maximize
+    # Compactness" by (movies, score less COMPACTNESS_DAY_COST per day). Returns None when it cannot
+    # finish within params['deadline'].
+    if len(titles) > DP_MAX_TITLES:
+        return None
+    days = [d for d in days if d in graphs]
+    bits = {t: 1 << i for i, t in enumerate(title_ids(titles))}
+    try:
+        day_paths = pool.map([(d_str, "options", titles) for d_str in days])
+    except TimeoutError:
+        return None
+
+    minimize_days = params.get('strategy') == "Minimize Days"
+    best = {0: ((0, 0, 0) if minimize_days else (0, 0), ())}
+
+    for d_str, paths in zip(days, day_paths):
+        options = {}
+        for path in paths:
+            options[sum(bits[s.title_id] for s in path)] = (calculate_path_score(path, params['primary_code'], drive_map)['score'], path)
+
+        step = dict(best)
+        for used, (value, plan) in best.items():
+            if time.monotonic() > params['deadline']:
+                return None
+            free = ~used & ((1 << len(titles)) - 1)
+            if 1 << free.bit_count() < len(options):
+                # Walk the submasks of the titles still free instead of every option
+                fits, sub = [], free
+                while sub:
+                    if sub in options:
+                        fits.append(sub)
+                    sub = (sub - 1) & free
+            else:
+                fits = [o_used for o_used in options if not o_used & used]
+
+            for o_used in fits:
+                o_score, o_path = options[o_used]
+                if minimize_days:
+                    new_value = (value[0] + o_used.bit_count(), value[1] - 1, value[2] + o_score)
+                else:
+                    new_value = (value[0] + o_used.bit_count(), value[1] + o_score - COMPACTNESS_DAY_COST)
+                merged = used | o_used
+                if merged not in step or new_value > step[merged][0]:
+                    step[merged] = (new_value, plan + ((d_str, o_path),))
+        best = step
+
+    return dict(max(best.values(), key=lambda x: x[0])[1])
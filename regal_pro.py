@@ -1,16 +1,27 @@
 # v2.0 RC
 import streamlit as st
 import json
+import csv
 import math
+import heapq
+import itertools
 import pgeocode
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
 import time
 import os
 import sys
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from bisect import bisect_right
+from urllib.parse import urlparse, parse_qs
 from datetime import datetime, timedelta, timezone, time as dt_time
 from curl_cffi import requests as c_requests
 from streamlit_js_eval import get_geolocation, set_cookie, get_cookie
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from regal_engine import (STRINGS, ATTRIBUTE_NAMES, SEARCH_TIME_LIMIT, Screening, DayGraph, SearchJob, DaySearchPool,
+                          to_minutes, get_search_filter, bucket_allowed, calculate_path_score, find_candidate_itineraries,
+                          run_search_unit, plan_days_exact, make_plan_pool)
 
 IS_CLOUD = "STREAMLIT_SERVER_ENABLE_XSRF_PROTECTION" in os.environ
 debug_mode = st.query_params.get("debug") if st.query_params.get("debug") else False
@@ -52,6 +63,9 @@ st.markdown("""
 
 # --- Constants & Headers ---
 THEATERS_FILE = get_resource_path("theater_list.json")
+SHOWTIME_CACHE_FILE = os.environ.get("REGAL_PRO_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "regal_pro", "showtimes.sqlite3"))
+SHOWTIME_CACHE_TTL = int(os.environ.get("REGAL_PRO_CACHE_TTL", 1800))
+SHOWTIME_CACHE_MAX_ROWS = int(os.environ.get("REGAL_PRO_CACHE_MAX_ROWS", 2000))
 
 AJAX_HEADERS = {
     "Host": "www.regmovies.com",
@@ -98,13 +112,79 @@ def get_proxy_health():
     except Exception:
         return "Offline / Config Error", "None"
 
-@st.cache_data
-def load_theaters():
+class TheaterRegistry:
+    # Read-only view of theater_list.json shared by every session: records by code, names,
+    # the nearby_theaters adjacency, and trigram indexes for the name and address searches.
+    # Callers must not mutate the records it hands out.
+    ADDRESS_FIELDS = ('address', 'city', 'state')
+
+    def __init__(self, theaters):
+        self.theaters = tuple(theaters)
+        self.position = {t['item']['theatre_code']: i for i, t in enumerate(self.theaters)}
+        self.by_code = {t['item']['theatre_code']: t for t in self.theaters}
+        self.names = {code: t['item']['name'] for code, t in self.by_code.items()}
+        self.neighbors = {code: tuple(t['item'].get('nearby_theaters', ())) for code, t in self.by_code.items()}
+        self.name_text = [(t['item']['name'].lower(),) for t in self.theaters]
+        self.address_text = [tuple(t['item'].get(f, '').lower() for f in self.ADDRESS_FIELDS) for t in self.theaters]
+        self.name_index = self.build_trigrams(self.name_text)
+        self.address_index = self.build_trigrams(self.address_text)
+
+    @staticmethod
+    def build_trigrams(texts):
+        index = {}
+        for i, fields in enumerate(texts):
+            for text in fields:
+                for j in range(len(text) - 2):
+                    index.setdefault(text[j:j + 3], set()).add(i)
+        return index
+
+    def get(self, code):
+        return self.by_code.get(code)
+
+    def shortest_routes(self, code):
+        # code -> (minutes, miles) of the fastest route from `code` over the nearby_theaters graph
+        routes, heap = {}, [(0, 0, code)]
+        while heap:
+            minutes, miles, at = heapq.heappop(heap)
+            if at in routes:
+                continue
+            routes[at] = (minutes, miles)
+            for nt in self.neighbors.get(at, ()):
+                if nt['code'] not in routes:
+                    heapq.heappush(heap, (minutes + nt.get('drive_min', 20), miles + nt.get('road_miles', 0), nt['code']))
+        return routes
+
+    def cluster(self, code):
+        # The theater followed by its nearby theaters, in list order
+        match = self.by_code.get(code)
+        if not match:
+            return []
+        nearby = sorted((self.position[nt['code']] for nt in self.neighbors[code] if nt['code'] in self.position))
+        return [match] + [self.theaters[i] for i in nearby]
+
+    def search(self, index, texts, query):
+        # Theaters where query is a case-insensitive substring of any indexed field
+        q = query.lower()
+        if len(q) >= 3:
+            postings = sorted((index.get(q[j:j + 3], set()) for j in range(len(q) - 2)), key=len)
+            candidates = sorted(set.intersection(*postings))
+        else:
+            candidates = range(len(self.theaters))
+        return [self.theaters[i] for i in candidates if any(q in text for text in texts[i])]
+
+    def search_name(self, query):
+        return self.search(self.name_index, self.name_text, query)
+
+    def search_address(self, query):
+        return self.search(self.address_index, self.address_text, query)
+
+@st.cache_resource
+def get_theater_registry():
     try:
         with open(THEATERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f).get("theatre_list", [])
+            return TheaterRegistry(json.load(f).get("theatre_list", []))
     except Exception as e:
-        st.error(f"Error loading theater list: {e}"); return []
+        st.error(f"Error loading theater list: {e}"); return TheaterRegistry([])
 
 def is_dst(dt):
     year = dt.year
@@ -150,16 +230,7 @@ def get_location_cookie():
             return None, None, None, None
 
 def get_zip_code_from_lat_lon(latitude, longitude):
-    geolocator = Nominatim(user_agent="regal_pro_v1.4")
-    geocode = RateLimiter(geolocator.reverse, min_delay_seconds=1)
-    coordinates = (latitude, longitude)
-
-    location = geocode(coordinates)
-
-    if location and 'address' in location.raw and 'postcode' in location.raw['address']:
-        return location.raw['address']['postcode']
-    else:
-        return None
+    return get_zip_table().nearest(latitude, longitude)
 
 def get_offset_from_lon(lon, state=None, target_date=None):
     if state in ['OH', 'WV', 'VA', 'NC', 'SC', 'GA', 'PA', 'NY', 'NJ', 'MD', 'DE', 'CT', 'RI', 'MA', 'VT', 'NH', 'ME', 'IN']: 
@@ -196,7 +267,229 @@ def calculate_haversine_distance(lat1, lon1, lat2, lon2):
     a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlam/2)**2
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
 
+class GeoGrid:
+    # Points bucketed into cell_deg x cell_deg lat/lon cells. A radius query only measures the
+    # points in the cells its bounding box touches, so it stays cheap as the list grows.
+    def __init__(self, points, cell_deg=1.0):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        for lat, lon, value in points:
+            self.cells.setdefault(self.cell(lat, lon), []).append((lat, lon, value))
+
+    def cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def within(self, lat, lon, radius):
+        # [(value, miles)] for every point within radius miles, nearest first
+        dlat = radius / 69.0
+        dlon = min(radius / (69.0 * max(math.cos(math.radians(min(abs(lat) + dlat, 90))), 1e-3)), 180)
+        (r0, c0), (r1, c1) = self.cell(lat - dlat, lon - dlon), self.cell(lat + dlat, lon + dlon)
+
+        hits = []
+        for r in range(r0, r1 + 1):
+            for c in range(c0, c1 + 1):
+                for p_lat, p_lon, value in self.cells.get((r, c), ()):
+                    d = calculate_haversine_distance(lat, lon, p_lat, p_lon)
+                    if d <= radius:
+                        hits.append((value, d))
+        hits.sort(key=lambda x: x[1])
+        return hits
+
+    def nearest(self, lat, lon, max_radius=100):
+        # Closest value within max_radius miles, widening the search until something is hit
+        radius = self.cell_deg * 35
+        while True:
+            hits = self.within(lat, lon, min(radius, max_radius))
+            if hits or radius >= max_radius:
+                return hits[0][0] if hits else None
+            radius *= 2
+
+class ZipTable:
+    # US zip -> centroid, backed by two float arrays so a lookup is one dict hit and two reads.
+    # The centroids are also gridded so a coordinate can be reverse-geocoded to its nearest zip.
+    def __init__(self, codes, lats, lons):
+        self.codes = list(codes)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.lats = array('d', lats)
+        self.lons = array('d', lons)
+        self.grid = GeoGrid(zip(self.lats, self.lons, self.codes), cell_deg=0.25)
+
+    def get(self, zip_code):
+        i = self.index.get(str(zip_code).strip()) if zip_code else None
+        return None if i is None else (self.lats[i], self.lons[i])
+
+    def nearest(self, lat, lon):
+        return self.grid.nearest(lat, lon)
+
+@st.cache_resource
+def get_zip_table():
+    # Read once per process from the GeoNames US file pgeocode keeps as a CSV in its
+    # STORAGE_DIR (building a Nominatim downloads it the first time). Places sharing a zip
+    # are averaged into one centroid, as pgeocode's own lookups do.
+    path = os.path.join(pgeocode.STORAGE_DIR, "US.txt")
+    if not os.path.exists(path):
+        pgeocode.Nominatim('us')
+    sums = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon = float(row['latitude']), float(row['longitude'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+            total = sums.setdefault(row['postal_code'].strip(), [0.0, 0.0, 0])
+            total[0] += lat
+            total[1] += lon
+            total[2] += 1
+    return ZipTable(sums, (t[0] / t[2] for t in sums.values()), (t[1] / t[2] for t in sums.values()))
+
+ROAD_FACTOR = 1.3
+MINUTES_PER_MILE = 1.25
+
+class DriveMatrix:
+    # (minutes, miles) between every pair of theaters in a cluster, kept as two flat n x n arrays.
+    # Pairs use the fastest route over the nearby_theaters graph; pairs it does not connect get
+    # a haversine estimate scaled by ROAD_FACTOR and MINUTES_PER_MILE.
+    def __init__(self, codes, registry):
+        self.codes = tuple(codes)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        n = len(self.codes)
+        self.minutes = array('H', bytes(2 * n * n))
+        self.miles = array('f', bytes(4 * n * n))
+
+        for i, from_code in enumerate(self.codes):
+            routes = registry.shortest_routes(from_code)
+            a = registry.get(from_code)
+            for j, to_code in enumerate(self.codes):
+                if i == j:
+                    continue
+                if to_code in routes:
+                    minutes, miles = routes[to_code]
+                else:
+                    b = registry.get(to_code)
+                    if not a or not b:
+                        continue
+                    miles = ROAD_FACTOR * calculate_haversine_distance(a['item']['latitude'], a['item']['longitude'],
+                                                                       b['item']['latitude'], b['item']['longitude'])
+                    minutes = miles * MINUTES_PER_MILE
+                self.minutes[i * n + j] = min(round(minutes), 0xFFFF)
+                self.miles[i * n + j] = round(miles, 1)
+
+    def drive(self, from_code, to_code):
+        if from_code == to_code:
+            return 0, 0
+        i, j = self.index.get(from_code), self.index.get(to_code)
+        if i is None or j is None:
+            return 20, 0
+        k = i * len(self.codes) + j
+        return self.minutes[k], round(self.miles[k], 1)
+
+@st.cache_resource
+def get_drive_matrix(primary_code):
+    registry = get_theater_registry()
+    return DriveMatrix([primary_code] + [nt['code'] for nt in registry.neighbors.get(primary_code, ())], registry)
+
+@st.cache_resource
+def get_theater_grid():
+    return GeoGrid((t['item']['latitude'], t['item']['longitude'], t) for t in get_theater_registry().theaters
+                   if t['item'].get('latitude') is not None and t['item'].get('longitude') is not None)
+
+class ShowtimeCache:
+    # getShowtimes payloads shared on disk by every session and process on the host,
+    # keyed by (theatres param, date). Any SQLite error degrades to a cache miss.
+    def __init__(self, path, ttl, max_rows):
+        self.path, self.ttl, self.max_rows = path, ttl, max_rows
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self.connect() as db:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("CREATE TABLE IF NOT EXISTS showtimes (theatres TEXT, date TEXT, fetched REAL, payload TEXT, PRIMARY KEY (theatres, date))")
+        except (sqlite3.Error, OSError):
+            self.path = None
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, theatres, date):
+        if not self.path:
+            return None
+        try:
+            with self.connect() as db:
+                row = db.execute("SELECT payload FROM showtimes WHERE theatres = ? AND date = ? AND fetched >= ?",
+                                 (theatres, date, time.time() - self.ttl)).fetchone()
+            return json.loads(row[0]) if row else None
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def put(self, theatres, date, payload):
+        if not self.path:
+            return
+        try:
+            with self.connect() as db:
+                db.execute("INSERT OR REPLACE INTO showtimes VALUES (?, ?, ?, ?)", (theatres, date, time.time(), json.dumps(payload)))
+                db.execute("DELETE FROM showtimes WHERE fetched < ?", (time.time() - self.ttl,))
+                db.execute("DELETE FROM showtimes WHERE rowid NOT IN (SELECT rowid FROM showtimes ORDER BY fetched DESC LIMIT ?)", (self.max_rows,))
+        except (sqlite3.Error, TypeError, ValueError):
+            pass
+
+@st.cache_resource
+def get_showtime_cache():
+    return ShowtimeCache(SHOWTIME_CACHE_FILE, SHOWTIME_CACHE_TTL, SHOWTIME_CACHE_MAX_ROWS)
+
+class RequestFlights:
+    # Process-wide single-flight for Regal API calls. Concurrent callers for the same URL wait
+    # on the one request in flight and share its parsed JSON instead of each burning a proxy session.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.stats = {"hits": 0, "fetched": 0, "coalesced": 0}
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = [threading.Event(), None]
+                self.stats["fetched"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call[0].wait()
+            return call[1]
+        try:
+            call[1] = fn()
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call[0].set()
+        return call[1]
+
+@st.cache_resource
+def get_request_flights():
+    return RequestFlights()
+
 def fetch_data(api_url, path_name, status_context, max_retries=3):
+    query = parse_qs(urlparse(api_url).query)
+    cache_key = (query.get("theatres", [""])[0], query.get("date", [""])[0])
+    cached = get_showtime_cache().get(*cache_key)
+    if cached is not None:
+        get_request_flights().count("hits")
+        return cached
+
+    def fetch():
+        payload = fetch_remote(api_url, path_name, status_context, max_retries)
+        if payload is not None:
+            get_showtime_cache().put(*cache_key, payload)
+        return payload
+    return get_request_flights().do(api_url, fetch)
+
+def fetch_remote(api_url, path_name, status_context, max_retries=3):
     proxies = None
     if IS_CLOUD:
         if "current_proxy_port" not in st.session_state:
@@ -218,7 +511,9 @@ def fetch_data(api_url, path_name, status_context, max_retries=3):
         if "api_session" not in st.session_state:
             st.session_state.api_session = c_requests.Session()
         
-        st.session_state.api_session.proxies = proxies
+        # Sync workers share the session; keep our own handle in case another one rotates it
+        session = st.session_state.api_session
+        session.proxies = proxies
         api_headers = AJAX_HEADERS.copy()
         api_headers["Referer"] = f"https://www.regmovies.com/theatres/{path_name}"
 
@@ -232,7 +527,7 @@ def fetch_data(api_url, path_name, status_context, max_retries=3):
                     })
     
         try:
-            response = st.session_state.api_session.get(
+            response = session.get(
                 api_url, 
                 headers=api_headers, 
                 impersonate="chrome124",
@@ -244,7 +539,7 @@ def fetch_data(api_url, path_name, status_context, max_retries=3):
             if response.status_code == 403:
                 st.session_state.current_proxy_port = 10001 + (st.session_state.current_proxy_port - 10001 + 1) % 10
                 st.session_state.proxy_session_id = os.urandom(4).hex()
-                del st.session_state.api_session
+                st.session_state.pop("api_session", None)
 
                 if attempt < max_retries - 1:
                     st.toast("Regal 403 detected. Rotating IP and retrying...")
@@ -259,15 +554,103 @@ def fetch_data(api_url, path_name, status_context, max_retries=3):
             continue
     return None
 
+SYNC_WORKERS = 4
+# Failed fetches a day gets before the sync stops asking for it (Force Refresh resets the count)
+SYNC_DAY_ATTEMPTS = 2
+
+@st.cache_resource
+def get_fetch_pool():
+    # Shared by all sessions so the number of in-flight Regal requests stays bounded
+    return ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix="regal-fetch")
+
+def submit_fetch(api_url, path_name, status_context):
+    ctx = get_script_run_ctx()
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fetch_data(api_url, path_name, status_context)
+    return get_fetch_pool().submit(run)
+
+def start_day_sync(days, target_codes, path_name, status_context, msg):
+    jobs = st.session_state.setdefault("sync_jobs", {})
+    for d_str in days:
+        log_msg = f"🌐 Fetching {d_str}..."
+        msg.toast(log_msg)
+        if status_context: status_context.write(log_msg)
+        api_url = f"https://www.regmovies.com/api/getShowtimes?theatres={','.join(target_codes)}&date={d_str}"
+        jobs[submit_fetch(api_url, path_name, status_context)] = ("day", d_str)
+
+def drain_day_sync(target_codes, t_item, cluster_theaters, status_context, msg, until=None):
+    # Merge fetched days into multi_day_raw as they land. A day is held back until the metadata
+    # gap-fill sweeps it depends on are in (a movie already being swept for another day is not
+    # swept twice), and the loop returns early once `until` is stored. Failed day fetches are
+    # counted in sync_failed; returns whether any day was merged.
+    jobs = st.session_state.setdefault("sync_jobs", {})
+    held = st.session_state.setdefault("sync_held", {})
+    sweeping = st.session_state.setdefault("sync_sweeping", {})
+    failed = st.session_state.setdefault("sync_failed", {})
+    merged = False
+
+    while jobs and until not in st.session_state.multi_day_raw:
+        done, _ = wait(list(jobs), return_when=FIRST_COMPLETED)
+        for f in done:
+            kind, d_str = jobs.pop(f)
+            try:
+                data = f.result()
+            except Exception:
+                data = None
+
+            if kind == "day":
+                if not data:
+                    failed[d_str] = failed.get(d_str, 0) + 1
+                    continue
+                all_flat_data, _, _, _ = flatten_data(data)
+                gaps = check_metadata_gaps(all_flat_data)
+                waiting = {sweeping[m_code] for m_code in gaps if m_code in sweeping}
+                new_gaps = {m_code: anchor for m_code, anchor in gaps.items() if m_code not in sweeping}
+
+                for anchor in set(new_gaps.values()):
+                    t_name = cluster_theaters.get(anchor, anchor)
+                    sweep_msg = f"🩹 Metadata gap fill: {d_str} via {t_name}"
+                    msg.toast(sweep_msg)
+                    if status_context: status_context.write(sweep_msg)
+                    rotated = [anchor] + [c for c in target_codes if c != anchor]
+                    sweep_url = f"https://www.regmovies.com/api/getShowtimes?theatres={','.join(rotated)}&date={d_str}"
+                    sweep = submit_fetch(sweep_url, t_item['path_name'], status_context)
+                    jobs[sweep] = ("sweep", d_str)
+                    sweeping.update({m_code: sweep for m_code, a in new_gaps.items() if a == anchor})
+                    waiting.add(sweep)
+                held[d_str] = (data, waiting)
+            else:
+                if data:
+                    flatten_data(data)
+                for m_code in [m for m, sweep in sweeping.items() if sweep is f]:
+                    del sweeping[m_code]
+
+            for day in [day for day, (_, waiting) in held.items() if not (waiting - {f})]:
+                day_data = held.pop(day)[0]
+                st.session_state.multi_day_raw[day] = day_data
+                get_week_index().add_day(day, day_data)
+                merged = True
+            for _, waiting in held.values():
+                waiting.discard(f)
+
+    if not jobs:
+        msg.toast("🎉 7-Day Sync Complete!")
+        if status_context: status_context.update(label="Sync Log Finished", state="complete", expanded=False)
+    return merged
+
 def flatten_data(data):
     flat_list = []
     
     if "global_movie_catalog" not in st.session_state:
         st.session_state.global_movie_catalog = {}
+    if "catalog_titles" not in st.session_state:
+        st.session_state.catalog_titles = {}
 
     for m in data.get('movies', []):
         m_code = m.get('MasterMovieCode')
         if m_code:
+            st.session_state.catalog_titles.setdefault(m.get('Title', 'Unknown'), m_code)
             st.session_state.global_movie_catalog[m_code] = {
                 'title': m.get('Title', 'Unknown'),
                 'rating': m.get('Rating', 'NR'), 
@@ -279,43 +662,40 @@ def flatten_data(data):
     raw_attrs_list = data.get('attributes', [])
     attr_map = {a.get('Acronym', '').strip(): a.get('ShortName', '').strip() 
                 for a in raw_attrs_list if a.get('Acronym')}
+    attr_bits = {}
 
     shows = data.get("shows", [])
-    active_movie_codes = set()
     
     for theater_show in shows:
-        t_code = theater_show.get("TheatreCode")
+        t_id = STRINGS.intern(theater_show.get("TheatreCode"))
         for movie in theater_show.get("Film", []):
             m_code = movie.get('MasterMovieCode')
-            active_movie_codes.add(m_code)
             
             meta = st.session_state.global_movie_catalog.get(m_code, {
                 'title': movie.get('Title', 'Unknown'),
                 'rating': 'NR', 
                 'duration': 0,
             })
+            title_id, rating_id, movie_id = STRINGS.intern(meta['title']), STRINGS.intern(meta['rating']), STRINGS.intern(m_code)
             
             for perf in movie.get("Performances", []):
                 try:
-                    show_dt = datetime.strptime(perf["CalendarShowTime"], "%Y-%m-%dT%H:%M:%S")
-                except ValueError:
+                    show_start = to_minutes(datetime.fromisoformat(perf["CalendarShowTime"]))
+                except (ValueError, TypeError):
                     continue
                 
-                raw_codes = perf.get("PerformanceAttributes", [])
-                expanded_names = sorted([attr_map.get(c.strip(), c) for c in raw_codes])
+                attr_mask = 0
+                for c in perf.get("PerformanceAttributes", []):
+                    if c not in attr_bits:
+                        attr_bits[c] = 1 << ATTRIBUTE_NAMES.intern(attr_map.get(c.strip(), c))
+                    attr_mask |= attr_bits[c]
                 
-                flat_list.append({
-                    "TheaterCode": t_code,
-                    "Title": meta['title'], 
-                    "Rating": meta['rating'], 
-                    "Duration": meta['duration'],
-                    "Showtime": show_dt,
-                    "Auditorium": str(perf.get("Auditorium", "?")),
-                    "ScreenType": perf.get("PerformanceGroup") or "2D",
-                    "Attributes": ", ".join(expanded_names),
-                    "raw_attrs": set(expanded_names),
-                    "master_code": m_code
-                })
+                flat_list.append(Screening(
+                    show_start, meta['duration'], t_id, title_id, rating_id,
+                    STRINGS.intern(perf.get("PerformanceGroup") or "2D"),
+                    STRINGS.intern(str(perf.get("Auditorium", "?"))),
+                    movie_id, attr_mask
+                ))
                 
     future_scheduled_date_map = {}
     future_formatted_date_map = {}
@@ -348,9 +728,9 @@ def flatten_data(data):
 def check_metadata_gaps(flat_list):
     gaps = {}
     for s in flat_list:
-        if s['Duration'] == 0:
-            if s['master_code'] not in gaps:
-                gaps[s['master_code']] = s['TheaterCode']
+        if s.duration == 0:
+            if s.master_code not in gaps:
+                gaps[s.master_code] = s.theater_code
     return gaps
 
 def is_new_release(opening_date_str):
@@ -382,78 +762,236 @@ def get_time_options():
         times.append(start.strftime("%H:%M")); start += timedelta(minutes=5)
     return times
 
+SHOWS_PER_PAGE = 50
+GROUPS_PER_PAGE = 10
+
+def paginate(items, per_page, key):
+    # The slice of `items` on the page picked in a pager above the view, so a rerun only ships
+    # one page of elements to the browser. The pager is skipped when everything fits.
+    pages = math.ceil(len(items) / per_page)
+    if pages <= 1:
+        return items
+    # The widget's value lives in session_state only, clamped here when the list shrinks
+    if key not in st.session_state:
+        st.session_state[key] = 1
+    elif st.session_state[key] > pages:
+        st.session_state[key] = pages
+    page_col, _ = st.columns([1, 4])
+    page = page_col.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=key)
+    return items[(page - 1) * per_page : page * per_page]
+
+def html_table(header, rows):
+    # A whole listing as one markdown element; rows are (cells, is_past) and past rows are struck out
+    head = "".join(f"<th style='text-align: left; padding: 4px 8px;'>{h}</th>" for h in header)
+    body = []
+    for cells, is_past in rows:
+        style = " style='color: grey; text-decoration: line-through;'" if is_past else ""
+        body.append(f"<tr{style}>" + "".join(f"<td style='padding: 4px 8px;'>{c}</td>" for c in cells) + "</tr>")
+    return f"<table style='width: 100%; border-collapse: collapse; font-size: 0.9rem;'><thead><tr>{head}</tr></thead><tbody>{''.join(body)}</tbody></table>"
+
+def local_time(tz_offset):
+    return (datetime.now(timezone.utc) + timedelta(hours=tz_offset)).replace(tzinfo=None)
+
 def generate_ics(path, theater_name):
     ics_lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Regal Pro//EN", "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
     for s in path:
-        start_t = s['Showtime'].strftime("%Y%m%dT%H%M%S")
-        end_t = (s['Showtime'] + timedelta(minutes=s['Duration'])).strftime("%Y%m%dT%H%M%S")
-        ics_lines.extend(["BEGIN:VEVENT", f"DTSTART:{start_t}", f"DTEND:{end_t}", f"SUMMARY:{s['Title']} ({s['ScreenType']})", f"LOCATION:{theater_name} - Audi {s['Auditorium']}", "END:VEVENT"])
+        start_t = s.showtime.strftime("%Y%m%dT%H%M%S")
+        end_t = s.end_time.strftime("%Y%m%dT%H%M%S")
+        ics_lines.extend(["BEGIN:VEVENT", f"DTSTART:{start_t}", f"DTEND:{end_t}", f"SUMMARY:{s.title} ({s.screen_type})", f"LOCATION:{theater_name} - Audi {s.auditorium}", "END:VEVENT"])
     ics_lines.append("END:VCALENDAR")
     return "\n".join(ics_lines)
 
-def find_itineraries(current_path, remaining_titles, screenings, p, selected_date, drive_map):
-    if len(current_path) >= p.get('max_per_day', 99):
-        return []
-    valid_paths = []
-    window_start = datetime.combine(selected_date, p['start'])
-    window_end = datetime.combine(selected_date, p['end'])
-    
-    if window_end <= window_start: 
-        window_end += timedelta(days=1)
-    elif p['end'] == dt_time(23, 59): 
-        window_end += timedelta(hours=6)
-
-    for title in remaining_titles:
-        potential_shows = [s for s in screenings if s['Title'] == title and s['TheaterCode'] in p['theaters']]
-        if p['formats']: 
-            potential_shows = [s for s in potential_shows if s['ScreenType'] in p['formats']]
-        
-        for s in potential_shows:
-            show_start = s['Showtime']
-            show_end = show_start + timedelta(minutes=s['Duration'])
-            if show_start < window_start or show_end > window_end: 
-                continue
-            
-            if current_path:
-                prev = current_path[-1]
-                prev_end = prev['Showtime'] + timedelta(minutes=prev['Duration'])
-                if p['fudge']: 
-                    prev_end -= timedelta(minutes=5)
-                
-                drive_time = 0
-                if s['TheaterCode'] != prev['TheaterCode']:
-                    nb_code = s['TheaterCode'] if s['TheaterCode'] != p['primary_code'] else prev['TheaterCode']
-                    drive_time = drive_map.get(nb_code, {}).get('time', 20)
-                
-                req_buffer = p['long_buffer'] if p['break_after'] == len(current_path) else p['buffer']
-                total_min_gap = drive_time + req_buffer
-                
-                if p['unlimited'] and show_start < prev['Showtime'] + timedelta(minutes=91): 
-                    continue
-                if show_start < prev_end + timedelta(minutes=total_min_gap): 
-                    continue
-                if (show_start - prev_end).total_seconds()/60 > p['gap_cap']: 
-                    continue
+def get_flat_day(d_str):
+    # flatten_data for a synced day, parsed once and shared by every caller until the
+    # raw payload for that day is refetched
+    day_data = st.session_state.multi_day_raw.get(d_str)
+    if not day_data:
+        return None
 
-            new_rem = [t for t in remaining_titles if t != title]
-            sub = find_itineraries(current_path + [s], new_rem, screenings, p, selected_date, drive_map)
-            if not sub: 
-                valid_paths.append(current_path + [s])
-            else: 
-                valid_paths.extend(sub)
-    
-    if not valid_paths and current_path:
-        return [current_path]
+    if "flat_days" not in st.session_state:
+        st.session_state.flat_days = {}
 
-    return valid_paths
+    cached = st.session_state.flat_days.get(d_str)
+    if cached is None or cached[0] is not day_data:
+        cached = (day_data, flatten_data(day_data))
+        st.session_state.flat_days[d_str] = cached
+    return cached[1]
 
-def find_multi_day_itineraries(target_movies, target_days, params, drive_map, anchor_show=None):
+def get_day_graph(d_str, primary_code, drive_map):
+    # One DayGraph per (day, primary theater), kept across reruns and rebuilt only when
+    # the flattened day changes
+    flat_day = get_flat_day(d_str)
+    if not flat_day:
+        return None
+
+    if "day_graphs" not in st.session_state:
+        st.session_state.day_graphs = {}
+
+    cached = st.session_state.day_graphs.get((d_str, primary_code))
+    if cached is None or cached[0] is not flat_day[0]:
+        cached = (flat_day[0], DayGraph(flat_day[0], primary_code, drive_map))
+        st.session_state.day_graphs[(d_str, primary_code)] = cached
+    return cached[1]
+
+class DayTable:
+    # Columnar view of one day for the Explorer filters. Rows are the day's screenings in start
+    # order and every filterable value (theater, title, movie, screen type, rating, auditorium,
+    # attribute, hour) maps to an int bitset over row numbers, so a filter combination is a few
+    # ORs within a column and ANDs across columns.
+    def __init__(self, screenings):
+        self.rows = sorted(screenings, key=lambda s: (s.start, s.theater_id, s.title_id))
+        self.starts = [s.start for s in self.rows]
+        self.all = (1 << len(self.rows)) - 1
+        self.theaters, self.titles, self.movies = {}, {}, {}
+        self.screens, self.ratings, self.auditoriums = {}, {}, {}
+        self.attrs, self.hours = {}, {}
+
+        for i, s in enumerate(self.rows):
+            bit = 1 << i
+            for column, value in ((self.theaters, s.theater_id), (self.titles, s.title_id),
+                                  (self.movies, s.movie_id), (self.screens, s.screen_id),
+                                  (self.ratings, s.rating_id), (self.auditoriums, s.auditorium_id),
+                                  (self.hours, s.start // 60 % 24)):
+                column[value] = column.get(value, 0) | bit
+            mask = s.attr_mask
+            while mask:
+                low = mask & -mask
+                attr_id = low.bit_length() - 1
+                self.attrs[attr_id] = self.attrs.get(attr_id, 0) | bit
+                mask ^= low
+
+    def matching(self, column, values):
+        # Rows whose value (a STRINGS string) is one of `values`
+        bits = 0
+        for value in values:
+            bits |= column.get(STRINGS.ids.get(value), 0)
+        return bits
+
+    def any_of(self, column, values):
+        # matching() for a multiselect filter, where nothing selected means no filter
+        return self.matching(column, values) if values else self.all
+
+    def all_attrs(self, names):
+        bits = self.all
+        for name in names:
+            bits &= self.attrs.get(ATTRIBUTE_NAMES.ids.get(name), 0)
+        return bits
+
+    def in_hours(self, windows):
+        # windows: (first hour, end hour) pairs, end exclusive
+        if not windows:
+            return self.all
+        bits = 0
+        for lo, hi in windows:
+            for hour in range(lo, hi):
+                bits |= self.hours.get(hour, 0)
+        return bits
+
+    def after(self, when):
+        # Rows starting strictly after the datetime `when`; rows are in start order, so a suffix
+        return self.all & ~((1 << bisect_right(self.starts, to_minutes(when))) - 1)
+
+    def select(self, bits):
+        out = []
+        while bits:
+            low = bits & -bits
+            out.append(self.rows[low.bit_length() - 1])
+            bits ^= low
+        return out
+
+def get_day_table(d_str):
+    # One DayTable per synced day, rebuilt only when the flattened day changes
+    flat_day = get_flat_day(d_str)
+    if not flat_day:
+        return None
+
+    if "day_tables" not in st.session_state:
+        st.session_state.day_tables = {}
+
+    cached = st.session_state.day_tables.get(d_str)
+    if cached is None or cached[0] is not flat_day[0]:
+        cached = (flat_day[0], DayTable(flat_day[0]))
+        st.session_state.day_tables[d_str] = cached
+    return cached[1]
+
+class WeekIndex:
+    # title -> theater code -> {date -> formats} over every synced day. Days are added (or
+    # replaced) one at a time as their payloads land in multi_day_raw, so the Explorer views
+    # read playing dates straight from here instead of rescanning the raw week.
+    def __init__(self):
+        self.titles = {}
+        self.master_codes = {}
+        self.days = {}
+
+    def add_day(self, d_str, day_data):
+        cached = self.days.get(d_str)
+        if cached is not None:
+            if cached[0] is day_data:
+                return
+            self.drop_day(d_str)
+
+        day = datetime.strptime(d_str, "%m-%d-%Y").date()
+        keys = []
+        for theater_show in day_data.get('shows', []):
+            t_code = theater_show.get('TheatreCode')
+            for movie in theater_show.get('Film', []):
+                title = movie.get('Title')
+                if not self.master_codes.get(title):
+                    self.master_codes[title] = movie.get('MasterMovieCode')
+                fmts = self.titles.setdefault(title, {}).setdefault(t_code, {}).setdefault(day, set())
+                fmts.update(p.get('PerformanceGroup') or "2D" for p in movie.get('Performances', []))
+                keys.append((title, t_code))
+        self.days[d_str] = (day_data, keys)
+
+    def drop_day(self, d_str):
+        _, keys = self.days.pop(d_str)
+        day = datetime.strptime(d_str, "%m-%d-%Y").date()
+        for title, t_code in keys:
+            by_theater = self.titles.get(title, {})
+            by_day = by_theater.get(t_code, {})
+            by_day.pop(day, None)
+            if not by_day:
+                by_theater.pop(t_code, None)
+            if not by_theater:
+                self.titles.pop(title, None)
+
+    def sync(self, multi_day_raw):
+        for d_str in [d for d in self.days if d not in multi_day_raw]:
+            self.drop_day(d_str)
+        for d_str, day_data in multi_day_raw.items():
+            self.add_day(d_str, day_data)
+        return self
+
+    def theaters(self, title):
+        return self.titles.get(title, {})
+
+    def playing_dates(self, title, t_code=None, fmt=None):
+        # "%b %d" labels in date order, optionally narrowed to one theater and/or format
+        by_theater = self.titles.get(title, {})
+        if t_code is not None:
+            by_theater = {t_code: by_theater.get(t_code, {})}
+        days = {d for by_day in by_theater.values() for d, fmts in by_day.items() if fmt is None or fmt in fmts}
+        return [d.strftime("%b %d") for d in sorted(days)]
+
+def get_week_index():
+    # Per-session WeekIndex, caught up with any day stored outside drain_day_sync
+    if "week_index" not in st.session_state:
+        st.session_state.week_index = WeekIndex()
+    return st.session_state.week_index.sync(st.session_state.multi_day_raw)
+
+@st.cache_resource
+def get_plan_pool():
+    # The multi-day planning pool, shared by every session and created by the first plan
+    return make_plan_pool()
+
+def find_multi_day_itineraries(target_movies, target_days, params, drive_map, anchor_show=None, stats=None):
+    # stats gets 'pool_error' when the planning pool broke and the plan was finished in-process
     itinerary_by_day = {}
     remaining_movies = list(target_movies)
     max_per_day = params.get('max_per_day', len(target_movies))
 
     if anchor_show:
-        a_day_str = anchor_show['Showtime'].strftime('%m-%d-%Y')
+        a_day_str = anchor_show.showtime.strftime('%m-%d-%Y')
         
         anchor_day_options = run_anchored_search(anchor_show, target_movies, a_day_str, params, drive_map)
         
@@ -462,212 +1000,121 @@ def find_multi_day_itineraries(target_movies, target_days, params, drive_map, an
             itinerary_by_day[a_day_str] = best_a_path
             
             for s in best_a_path:
-                if s['Title'] in remaining_movies:
-                    remaining_movies.remove(s['Title'])
+                if s.title in remaining_movies:
+                    remaining_movies.remove(s.title)
     
-    sorted_days = sorted([d for d in target_days if d != (anchor_show['Showtime'].strftime('%m-%d-%Y') if anchor_show else None)],
+    sorted_days = sorted([d for d in target_days if d != (anchor_show.showtime.strftime('%m-%d-%Y') if anchor_show else None)],
                         key=lambda x: datetime.strptime(x, '%m-%d-%Y'))
     
-    if params.get('strategy') == "Minimize Days":
-        for i, d_str in enumerate(sorted_days):
-            if not remaining_movies: break
-            
-            d_obj = datetime.strptime(d_str, '%m-%d-%Y').date()
-            day_data = st.session_state.multi_day_raw.get(d_str)
-            if not day_data: continue
-            day_flat, _, _, _ = flatten_data(day_data)
-
-            # Find all valid paths for today
-            all_paths = find_itineraries([], remaining_movies, day_flat, params, d_obj, drive_map)
-            if not all_paths: continue
-
-            # Limit candidates to the top 5 most diverse/high-scoring paths to manage performance
-            candidates = sorted([p for p in all_paths if len(p) <= max_per_day], 
-                                key=lambda x: (-len(x), -calculate_path_score(x, params['primary_code'], drive_map)['score']))[:5]
-
-            best_path_for_today = None
-            max_future_yield = -1
-
-            # Simulation: If there are future days, see which candidate today yields the most movies overall
-            if i < len(sorted_days) - 1:
-                for cand in candidates:
-                    cand_titles = [s['Title'] for s in cand]
-                    mock_remaining = [m for m in remaining_movies if m not in cand_titles]
-                    
+    graphs = {}
+    for d_str in sorted_days:
+        day_graph = get_day_graph(d_str, params['primary_code'], drive_map)
+        if day_graph:
+            graphs[d_str] = day_graph
+
+    # The exact planner gets the time limit; past that the greedy strategies below are used
+    plan_params = dict(params, deadline=time.monotonic() + params.get('time_limit', SEARCH_TIME_LIMIT))
+
+    stats = {} if stats is None else stats
+    with DaySearchPool(graphs, plan_params, drive_map, get_plan_pool(), stats) as pool:
+        exact_plan = plan_days_exact(remaining_movies, sorted_days, graphs, plan_params, drive_map, pool) if remaining_movies else {}
+        if exact_plan is not None:
+            itinerary_by_day.update(exact_plan)
+        elif params.get('strategy') == "Minimize Days":
+            for i, d_str in enumerate(sorted_days):
+                if not remaining_movies: break
+                if d_str not in graphs: continue
+
+                # Limit candidates to the top 5 longest/high-scoring paths to manage performance
+                candidates = run_search_unit(graphs, params, drive_map, (d_str, "count", remaining_movies))
+                if not candidates: continue
+
+                best_path_for_today = None
+                max_future_yield = -1
+
+                # Simulation: If there are future days, see which candidate today yields the most movies overall
+                if i < len(sorted_days) - 1:
                     # Mock the next day only for a fast "one-step look-ahead"
                     next_day_str = sorted_days[i+1]
-                    nd_obj = datetime.strptime(next_day_str, '%m-%d-%Y').date()
-                    nd_data = st.session_state.multi_day_raw.get(next_day_str)
-                    if nd_data:
-                        nd_flat, _, _, _ = flatten_data(nd_data)
-                        next_day_paths = find_itineraries([], mock_remaining, nd_flat, params, nd_obj, drive_map)
-                        next_day_yield = max([len(p) for p in next_day_paths if len(p) <= max_per_day]) if next_day_paths else 0
-                    else:
-                        next_day_yield = 0
-                    
-                    total_yield = len(cand) + next_day_yield
-                    if total_yield > max_future_yield:
-                        max_future_yield = total_yield
-                        best_path_for_today = cand
-            else:
-                # Last day, no look-ahead needed
-                best_path_for_today = candidates[0]
+                    mock_units = []
+                    for cand in candidates:
+                        cand_titles = [s.title for s in cand]
+                        mock_units.append((next_day_str, "dp", [m for m in remaining_movies if m not in cand_titles]))
 
-            if best_path_for_today:
-                itinerary_by_day[d_str] = best_path_for_today
-                for s in best_path_for_today:
-                    remaining_movies.remove(s['Title'])
-                    
-                                        
-    else: # Strategy: Maximize Compactness
-        global_pool = []
-        for d_str in sorted_days:
-            d_obj = datetime.strptime(d_str, '%m-%d-%Y').date()
-            day_data = st.session_state.multi_day_raw.get(d_str)
-            day_flat, _, _, _ = flatten_data(day_data)
-
-            paths = find_itineraries([], target_movies, day_flat, params, d_obj, drive_map)
-            for p in paths:
-                if len(p) <= max_per_day:
-                    stats = calculate_path_score(p, params['primary_code'], drive_map)
-                    global_pool.append({
-                        'date': d_str, 
-                        'path': p, 
-                        'score': stats['score'], 
-                        'count': len(p)
-                    })
-        
-        global_pool.sort(key=lambda x: -x['score'])
-        
-        assigned_dates = set()
-        for entry in global_pool:
-            if not remaining_movies: break
-            if entry['date'] in assigned_dates: continue
-            
-            needed_in_path = [s for s in entry['path'] if s['Title'] in remaining_movies]
-            
-            if len(needed_in_path) == len(entry['path']):
-                itinerary_by_day[entry['date']] = entry['path']
-                assigned_dates.add(entry['date'])
-                for s in entry['path']:
-                    remaining_movies.remove(s['Title'])
+                    if next_day_str in graphs:
+                        next_day_yields = [len(best[0]) if best else 0 for best in pool.map(mock_units)]
+                    else:
+                        next_day_yields = [0] * len(candidates)
 
+                    for cand, next_day_yield in zip(candidates, next_day_yields):
+                        total_yield = len(cand) + next_day_yield
+                        if total_yield > max_future_yield:
+                            max_future_yield = total_yield
+                            best_path_for_today = cand
+                else:
+                    # Last day, no look-ahead needed
+                    best_path_for_today = candidates[0]
+
+                if best_path_for_today:
+                    itinerary_by_day[d_str] = best_path_for_today
+                    for s in best_path_for_today:
+                        remaining_movies.remove(s.title)
+
+        else: # Strategy: Maximize Compactness
+            global_pool = []
+            day_units = [(d_str, "all", target_movies) for d_str in sorted_days if d_str in graphs]
+            for (d_str, _, _), paths in zip(day_units, pool.map(day_units)):
+                for p in paths:
+                    if len(p) <= max_per_day:
+                        stats = calculate_path_score(p, params['primary_code'], drive_map)
+                        global_pool.append({
+                            'date': d_str, 
+                            'path': p, 
+                            'score': stats['score'], 
+                            'count': len(p)
+                        })
+
+            # The sort is stable, so paths with equal scores keep iter_itineraries' yield order
+            global_pool.sort(key=lambda x: -x['score'])
+
+            assigned_dates = set()
+            for entry in global_pool:
+                if not remaining_movies: break
+                if entry['date'] in assigned_dates: continue
+
+                needed_in_path = [s for s in entry['path'] if s.title in remaining_movies]
+
+                if len(needed_in_path) == len(entry['path']):
+                    itinerary_by_day[entry['date']] = entry['path']
+                    assigned_dates.add(entry['date'])
+                    for s in entry['path']:
+                        remaining_movies.remove(s.title)
+
+    if 'pool_error' in stats:
+        # A broken pool stays broken, so let the next plan start a new one
+        get_plan_pool.clear()
     return itinerary_by_day
 
 def run_anchored_search(anchor_show, target_movies, day_str, params, drive_map):
-    day_data = st.session_state.multi_day_raw.get(day_str)
-    if not day_data:
+    # Candidate itineraries through the anchor show, with the morning and evening wings searched together
+    day_graph = get_day_graph(day_str, params['primary_code'], drive_map)
+    if not day_graph:
         return []
-    
-    day_flat, _, _, _ = flatten_data(day_data)
-    d_obj = datetime.strptime(day_str, '%m-%d-%Y').date()
-    total_max = params.get('max_per_day', 99)
-
-    wing_titles = [t for t in target_movies if t != anchor_show['Title']]
-    
-    after_paths = find_itineraries([anchor_show], wing_titles, day_flat, params, d_obj, drive_map)
-    if not after_paths:
-        after_paths = [[anchor_show]]
-
-    before_params = params.copy()
-    before_params['max_per_day'] = total_max - 1
-    latest_cutoff = anchor_show['Showtime'] - timedelta(minutes=params['buffer'])
-    before_params['end'] = latest_cutoff.time()
-    
-    raw_before = find_itineraries([], wing_titles, day_flat, before_params, d_obj, drive_map)
-    
-    valid_before = []
-
-    if not raw_before:
-        valid_before = [[]]
-    else:
-        for b_path in raw_before:
-            if not b_path:
-                valid_before.append([])
-                continue
-            
-            last_m = b_path[-1]
-            last_m_end = last_m['Showtime'] + timedelta(minutes=last_m['Duration'])
-            
-            travel_time = 0
-            if last_m['TheaterCode'] != anchor_show['TheaterCode']:
-                nb_code = last_m['TheaterCode'] if last_m['TheaterCode'] != params['primary_code'] else anchor_show['TheaterCode']
-                travel_time = drive_map.get(nb_code, {}).get('time', 20)
-            
-            # Ensure the last movie in the morning wing ends before the anchor starts
-            if last_m_end + timedelta(minutes=travel_time + params['buffer']) <= anchor_show['Showtime']:
-                valid_before.append(b_path)
-    
-    # If the travel/buffer checks above filtered everything out, revert to [[]] 
-    # so the anchor can still be scheduled alone or with future shows.
-    if not valid_before:
-        valid_before = [[]]
-            
-    combined_itineraries = []
-    search_before = valid_before if valid_before else [[]]
-
-    for b_path in search_before:
-        for a_path in after_paths:
-            full_path = b_path + a_path 
-            if len(full_path) <= params['max_per_day']:
-                titles = [s['Title'] for s in full_path]
-                if len(titles) == len(set(titles)):
-                    combined_itineraries.append(full_path)
-    return combined_itineraries
-
-    first_day = target_days[0]
-    day_flat, _, _, _ = flatten_data(first_day)
-    
-    candidates = find_itineraries([], target_movies, day_flat, params, first_day, drive_map)
-    
-    best_overall_plan = {}
-    max_total_movies = -1
 
-    for path in candidates[:5]:
-        current_plan = {first_day: path}
-        remaining = [m for m in target_movies if m not in [s['Title'] for s in path]]
-        
-        rest_of_week = find_multi_day_itineraries(remaining, target_days[1:], params, drive_map)
-        
-        total_count = len(path) + sum(len(p) for p in rest_of_week.values())
-        
-        if total_count > max_total_movies:
-            max_total_movies = total_count
-            best_overall_plan = {**current_plan, **rest_of_week}
-            
-    return best_overall_plan
+    d_obj = datetime.strptime(day_str, '%m-%d-%Y').date()
+    return find_candidate_itineraries(target_movies, day_graph, params, d_obj, drive_map, anchor=anchor_show)
 
-def calculate_path_score(path, primary_code, drive_map):
-    movie_count = len(path)
-    hops, total_miles, total_gap, total_duration = 0, 0, 0, 0
-    
-    for i in range(len(path)):
-        s = path[i]
-        total_duration += s['Duration']
-        
-        if i < len(path) - 1:
-            nxt = path[i+1]
-            curr_end = s['Showtime'] + timedelta(minutes=s['Duration'])
-            total_gap += int((nxt['Showtime'] - curr_end).total_seconds() / 60)
-            
-            if s['TheaterCode'] != nxt['TheaterCode']:
-                hops += 1
-                nb_code = nxt['TheaterCode'] if nxt['TheaterCode'] != primary_code else s['TheaterCode']
-                total_miles += drive_map.get(nb_code, {}).get('dist', 0)
-
-    score = (movie_count * 250) - (hops * 40) - (total_miles * 2) - (total_gap * 0.1)
-    return {
-        'score': score, 'count': movie_count, 'hops': hops, 
-        'miles': total_miles, 'gap': total_gap, 'duration': total_duration
-    }
+def get_conflict_report(path, missing_titles, all_screenings, p, anchor_show=None, drive_map=None):
+    if isinstance(all_screenings, list):
+        all_screenings = DayGraph(all_screenings, p['primary_code'], drive_map)
 
-def get_conflict_report(path, missing_titles, all_screenings, p, anchor_show=None, drive_map={}):
+    allowed = get_search_filter(p)
     conflicts = []
     for m_title in missing_titles:
         # 1. Filter initial pool
-        m_shows = [s for s in all_screenings if s['Title'] == m_title and s['TheaterCode'] in p['theaters']]
-        if p['formats']: 
-            m_shows = [s for s in m_shows if s['ScreenType'] in p['formats']]
+        m_shows = [s for key, (shows, _) in all_screenings.index.get(STRINGS.ids.get(m_title), {}).items()
+                   if bucket_allowed(key, allowed)
+                   for s in shows]
         
         if not m_shows:
             conflicts.append(f"❌ **{m_title}**: No screenings match your formats/theaters.")
@@ -678,8 +1125,7 @@ def get_conflict_report(path, missing_titles, all_screenings, p, anchor_show=Non
         failure_details = [] 
 
         for ms in m_shows:
-            ms_start = ms['Showtime']
-            ms_end = ms_start + timedelta(minutes=ms['Duration'])
+            ms_start, ms_end = ms.start, ms.end
             reasons = []
 
             # 2. Daily Limit Check
@@ -688,32 +1134,27 @@ def get_conflict_report(path, missing_titles, all_screenings, p, anchor_show=Non
 
             # 3. Anchor Check (Highest Priority)
             if anchor_show:
-                a_start, a_end = anchor_show['Showtime'], anchor_show['Showtime'] + timedelta(minutes=anchor_show['Duration'])
+                a_start, a_end = anchor_show.start, anchor_show.end
                 if not (ms_end <= a_start or ms_start >= a_end):
-                    reasons.append((1, f"Overlaps with your **Anchor Show** ({anchor_show['Title']})."))
+                    reasons.append((1, f"Overlaps with your **Anchor Show** ({anchor_show.title})."))
 
             # 4. Detailed Path Linkage
             for ps in path:
-                ps_start = ps['Showtime']
-                ps_end = ps_start + timedelta(minutes=ps['Duration'])
+                ps_start, ps_end = ps.start, ps.end
                 
                 # Check Physical Overlap
                 if not (ms_end <= ps_start or ms_start >= ps_end):
-                    reasons.append((1, f"Overlaps with **{ps['Title']}** ({ps_start.strftime('%I:%M %p')})."))
+                    reasons.append((1, f"Overlaps with **{ps.title}** ({ps.showtime.strftime('%I:%M %p')})."))
                     break # Immediate exit for physical impossibility
                 
                 # Check Logical Constraints
                 if ms_start >= ps_end:
-                    gap = int((ms_start - ps_end).total_seconds() / 60)
-                    travel = 0
-                    if ms['TheaterCode'] != ps['TheaterCode']:
-                        nb = ms['TheaterCode'] if ms['TheaterCode'] != p['primary_code'] else ps['TheaterCode']
-                        travel = drive_map.get(nb, {}).get('time', 20)
-                    
+                    gap, travel, _ = all_screenings.transition(ps, ms)
+
                     if gap < (travel + p['buffer']):
-                        reasons.append((2, f"Buffer violation after **{ps['Title']}** (Gap is {gap}m, needs {travel + p['buffer']}m)."))
+                        reasons.append((2, f"Buffer violation after **{ps.title}** (Gap is {gap}m, needs {travel + p['buffer']}m)."))
                     elif gap > p['gap_cap']:
-                        reasons.append((5, f"Gap after **{ps['Title']}** ({gap}m) exceeds your Max Gap ({p['gap_cap']}m)."))
+                        reasons.append((5, f"Gap after **{ps.title}** ({gap}m) exceeds your Max Gap ({p['gap_cap']}m)."))
 
             if not reasons:
                 any_valid = True
@@ -745,975 +1186,958 @@ def generate_batch_ics(multi_itinerary, theater_name_map):
     for d_str in sorted_days:
         path = multi_itinerary[d_str]
         for s in path:
-            start_t = s['Showtime'].strftime("%Y%m%dT%H%M%S")
-            end_t = (s['Showtime'] + timedelta(minutes=s['Duration'])).strftime("%Y%m%dT%H%M%S")
-            t_name = theater_name_map.get(s['TheaterCode'], "Regal Theater")
+            start_t = s.showtime.strftime("%Y%m%dT%H%M%S")
+            end_t = s.end_time.strftime("%Y%m%dT%H%M%S")
+            t_name = theater_name_map.get(s.theater_code, "Regal Theater")
             
             ics_lines.extend([
                 "BEGIN:VEVENT", 
                 f"DTSTART:{start_t}", 
                 f"DTEND:{end_t}", 
-                f"SUMMARY:{s['Title']} ({s['ScreenType']})", 
-                f"LOCATION:{t_name} - Audi {s['Auditorium']}", 
+                f"SUMMARY:{s.title} ({s.screen_type})", 
+                f"LOCATION:{t_name} - Audi {s.auditorium}", 
                 "END:VEVENT"
             ])
             
     ics_lines.append("END:VCALENDAR")
     return "\n".join(ics_lines)
 
+@st.fragment
+def now_playing_panel(view):
+    # Now Playing filters and listings. Filter changes rerun only this panel against the day
+    # state the full run prepared, not the theater search and sync above it.
+    t_item, q_date, f_date = view['t_item'], view['q_date'], view['f_date']
+    flat_data, movie_meta, cluster_theaters = view['flat_data'], view['movie_meta'], view['cluster_theaters']
+    print_mode = view['print_mode']
+    t_key = t_item['theatre_code']
+    current_local_time = local_time(view['tz_offset'])
+
+    st.subheader("🍿 Now Playing")
+    st.caption(f"These movies are playing today at {t_item['name']}.")
+
+    with st.expander("🔍 Filters & Sorting", expanded=not print_mode):
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            f_type = st.multiselect("Screen Type", 
+                                    options=sorted(list(set(s.screen_type for s in flat_data))), 
+                                    placeholder="All",
+                                    key=f"f_type_{t_key}")
+            f_rating = st.multiselect("Rating", 
+                                      options=sorted(list(set(s.rating for s in flat_data))), 
+                                      placeholder="All",
+                                      key=f"f_rating_{t_key}")
+        with c2:
+            f_audi = st.multiselect("Auditorium", 
+                                    options=sorted(list(set(s.auditorium for s in flat_data)), key=lambda x: int(x) if x.isdigit() else 999), 
+                                    placeholder="All",
+                                    key=f"f_audi_{t_key}")
+
+            current_st = set(f_type) if f_type else set(s.screen_type for s in flat_data)
+            all_expanded_attrs = set(a for s in flat_data for a in s.raw_attrs)
+            deduped_attrs = sorted([a for a in all_expanded_attrs if a not in current_st])
+
+            f_attr = st.multiselect("Additional Filters", 
+                                    options=deduped_attrs, 
+                                    placeholder="All",
+                                    key=f"f_attr_{t_key}")
+        with c3:
+            t_ranges = {"8AM - 12N": (8, 12), "12N - 4PM": (12, 16), "4PM - 8PM": (16, 20), "8PM - 12M": (20, 24)}
+            f_times = st.multiselect("Time Window", 
+                                     options=list(t_ranges.keys()), 
+                                     placeholder="All",
+                                     key=f"f_times_{t_key}")
+            f_avail = st.checkbox("Hide past shows", value=True, key=f"f_avail_{t_key}")
+            f_new = st.checkbox("New Releases Only", value=False, key=f"f_new_{t_key}")
+        with c4:
+            sort_by = st.selectbox("Sort By", 
+                                   ["Movie Title", "Showtime", "Auditorium"],
+                                   key=f"sort_by_{t_key}")
+            view_mode = st.selectbox("View Mode", 
+                                     ["Group by Movie", "Group by Auditorium", "Full Schedule"],
+                                     key=f"view_mode_{t_key}")
+
+    day_table = get_day_table(f_date)
+    shown = (day_table.any_of(day_table.theaters, [t_key]) &
+             day_table.any_of(day_table.screens, f_type) &
+             day_table.any_of(day_table.ratings, f_rating) &
+             day_table.any_of(day_table.auditoriums, f_audi) &
+             day_table.all_attrs(f_attr) &
+             day_table.in_hours([t_ranges[t] for t in f_times]))
+    if f_avail and q_date == current_local_time.date():
+        shown &= day_table.after(current_local_time)
+    if f_new:
+        shown &= day_table.matching(day_table.movies, [m_code for m_code, m in movie_meta.items() if m.get('is_new')])
+    filtered = day_table.select(shown)
+
+    if sort_by == "Movie Title": filtered.sort(key=lambda x: (x.title, x.showtime))
+    elif sort_by == "Showtime": filtered.sort(key=lambda x: (x.showtime, x.title))
+    elif sort_by == "Auditorium": filtered.sort(key=lambda x: (int(x.auditorium) if x.auditorium.isdigit() else 999, x.showtime))
+
+    st.write(f"Showing **{len(set(s.title for s in filtered))}** movies and **{len(filtered)}** screenings.")
+
+    is_today = (q_date == current_local_time.date())
+    if view_mode == "Full Schedule":
+        page = filtered if print_mode else paginate(filtered, SHOWS_PER_PAGE, f"page_full_{t_key}")
+        st.markdown(html_table(
+            ["Time", "Format", "Movie", "Rating", "Runtime", "Audi", "Attributes"],
+            [([f"<b>{s.showtime.strftime('%I:%M %p')}</b>", s.screen_type, f"<b>{s.title}</b>", s.rating,
+               f"{s.duration} min", s.auditorium, f"<small>{s.attributes}</small>"],
+              is_today and s.showtime < current_local_time) for s in page]
+        ), unsafe_allow_html=True)
+    elif view_mode == "Group by Auditorium":
+        by_audi = sorted(filtered, key=lambda x: (int(x.auditorium) if x.auditorium.isdigit() else 999, x.auditorium, x.start))
+        audi_groups = [(audi, list(shows)) for audi, shows in itertools.groupby(by_audi, key=lambda x: x.auditorium)]
+        if not print_mode:
+            audi_groups = paginate(audi_groups, GROUPS_PER_PAGE, f"page_audi_{t_key}")
+        for audi, audi_shows in audi_groups:
+            with st.expander(f"🖼️ Auditorium {audi}", expanded=True):
+                st.markdown(html_table(
+                    ["Time", "Movie", "Format", "Runtime"],
+                    [([f"<b>{s.showtime.strftime('%I:%M %p')}</b>", f"<b>{s.title}</b>", s.screen_type, f"{s.duration}m"],
+                      is_today and s.showtime < current_local_time) for s in audi_shows]
+                ), unsafe_allow_html=True)
+    else: # Group by Movie
+        week_index = get_week_index()
+        title_order = {}
+        for s in filtered:
+            title_order.setdefault(s.title_id, len(title_order))
+
+        title_groups = [list(m_shows) for _, m_shows in itertools.groupby(sorted(filtered, key=lambda x: title_order[x.title_id]), key=lambda x: x.title_id)]
+        if not print_mode:
+            title_groups = paginate(title_groups, GROUPS_PER_PAGE, f"page_movie_{t_key}")
+
+        for m_shows in title_groups:
+            title_id = m_shows[0].title_id
+            title = m_shows[0].title
+            title_rows = day_table.titles[title_id]
+
+            other_t = sorted([cluster_theaters.get(STRINGS.values[t_id], f"Theater {STRINGS.values[t_id]}") 
+                            for t_id, rows in day_table.theaters.items() 
+                            if rows & title_rows and STRINGS.values[t_id] != t_item['theatre_code']])
+
+            scheduled_days = week_index.playing_dates(title)
+
+            meta = movie_meta.get(m_shows[0].master_code, {})
+            new_tag = "🔴 NEW" if meta.get('is_new') else ""
+
+            with st.expander(f"🍿 {title} ({m_shows[0].rating}) — {m_shows[0].duration} min {new_tag}", expanded=True):
+                fmt_blocks = []
+                for mt, ts in itertools.groupby(sorted(m_shows, key=lambda x: x.screen_type), key=lambda x: x.screen_type):
+                    ts = list(ts)
+                    t_common = set.intersection(*(s.raw_attrs for s in ts)) if ts else set()
+                    common_attribs = sorted(t_common - {mt})
+                    fmt_blocks.append(f'<div style="margin-bottom: 6px;"><span style="background-color: rgba(151, 166, 195, 0.15); padding: 4px 12px; border-radius: 4px; border-left: 4px solid #ff4b4b;"><span style="font-weight: bold;">{mt}</span> <span style="color: grey; font-size: 0.85em; font-weight: normal; margin-left: 10px;">({", ".join(sorted(common_attribs)) if common_attribs else ""})</span></span></div>')
+
+                    row = []
+                    for s in ts:
+                        is_past = (is_today and s.showtime < current_local_time)
+                        delta_attribs = get_attr_diff(s.attributes, t_common)
+                        t_str = s.showtime.strftime('%I:%M %p')
+                        if is_past:
+                            final_time = f"<del>{t_str}</del>" 
+                            meta_text = f"  <small style='color:grey'><del>(Audi {s.auditorium}) {delta_attribs}</del></small>"
+                        else:
+                            final_time = f"{t_str}" 
+                            meta_text = f"  <small style='color:grey'>(Audi {s.auditorium}) {delta_attribs}</small>"
+                        row.append(f"{final_time}{meta_text}")
+
+                    fmt_blocks.append(f"<p>&nbsp;&nbsp;&nbsp;&nbsp;{' | '.join(row)}</p>")
+
+                st.markdown("".join(fmt_blocks), unsafe_allow_html=True)
+
+                footer_col, link_col = st.columns([4, 1])
+                with footer_col:
+                    if scheduled_days:
+                        st.markdown(f"<div style='font-size: 0.8rem; color: #e67e22; padding-top: 2px;'>🗓️ <b>Scheduled Dates:</b> {', '.join(scheduled_days)}</div>", unsafe_allow_html=True)
+                    if other_t:
+                        st.markdown(f"<div style='font-size: 0.8rem; color: #666; padding-top: 5px;'><b>Also Playing at:</b> {', '.join(other_t)}</div>", unsafe_allow_html=True)
+
+                with link_col:
+                    if other_t or scheduled_days:
+                        if st.button("📅 Full Schedule", key=f"link_{title}_{t_item['theatre_code']}", use_container_width=True):
+                            st.session_state.nav_redirect = "🎬 Movie Explorer"
+                            st.session_state.selected_movie = title
+                            st.rerun()
+
+@st.fragment
+def movie_explorer_panel(view):
+    # Movie grid and per-movie showtimes; picking a movie or a filter reruns only this panel
+    t_item, q_date, f_date = view['t_item'], view['q_date'], view['f_date']
+    all_flat_data, movie_meta = view['all_flat_data'], view['movie_meta']
+    current_local_time = local_time(view['tz_offset'])
+    registry = get_theater_registry()
+
+    st.subheader("🎬 Movie Explorer")
+    st.info(f"Movies: **{t_item['name']}** and nearby theaters on **{q_date.strftime('%A, %b %d')}**")
+
+
+    theater_info = {t_item['theatre_code']: {"name": t_item['name'], "dist": 0, "time": 0}}
+    for nt in registry.neighbors.get(t_item['theatre_code'], ()):
+        n_code = nt['code']
+        theater_info[n_code] = {
+            "name": registry.names.get(n_code, f"Theater {n_code}"), 
+            "dist": nt.get('road_miles', 0), 
+            "time": nt.get('drive_min', 0)
+        }
+
+    movie_list_data = []
+    titles_processed = set()
+    for s in all_flat_data:
+        if s.title not in titles_processed:
+            rating = movie_meta.get(s.master_code, {}).get('rating', 'NR')
+            movie_list_data.append({"title": s.title, "label": f"{s.title} ({rating})"})
+            titles_processed.add(s.title)
+    movie_list_data.sort(key=lambda x: x['title'])
+
+    st.markdown("###### 🍿 Select a Movie")
+    st.markdown("""
+        <style>
+        div.stButton > button {
+            width: 100% !important;
+            height: 40px !important;
+            border-radius: 6px !important;
+            background-color: rgba(151, 166, 195, 0.1) !important;
+            border: 1px solid rgba(151, 166, 195, 0.2) !important;
+            transition: all 0.2s ease-in-out !important;
+        }
+        div.stButton > button:hover {
+            background-color: rgba(151, 166, 195, 0.2) !important;
+            border-color: #ff4b4b !important;
+        }
+        div.stButton > button div p {
+            white-space: nowrap !important;
+            overflow: hidden !important;
+            text-overflow: ellipsis !important;
+            font-size: 0.75rem !important;
+            font-weight: 600 !important;
+            color: var(--text-color) !important;
+        }
+        </style>
+    """, unsafe_allow_html=True)
+
+    if "selected_movie" not in st.session_state:
+        st.session_state.selected_movie = movie_list_data[0]['title'] if movie_list_data else None
+
+    with st.container(height=130, border=True):
+        cols_per_row = 5
+        for i in range(0, len(movie_list_data), cols_per_row):
+            row_cols = st.columns(cols_per_row)
+            for j, m_entry in enumerate(movie_list_data[i : i + cols_per_row]):
+                title = m_entry['title']
+                is_selected = (title == st.session_state.selected_movie)
+                label = f"✅ {m_entry['label']}" if is_selected else m_entry['label']
+                if row_cols[j].button(label, key=f"grid_{title}", use_container_width=True):
+                    st.session_state.selected_movie = title
+                    st.rerun(scope="fragment")
+
+    sel_movie = st.session_state.selected_movie
+    if sel_movie:
+        day_table = get_day_table(f_date)
+        m_rows = day_table.any_of(day_table.titles, [sel_movie])
+        m_data = day_table.select(m_rows)
+        meta = movie_meta.get(m_data[0].master_code, {})
+        new_tag = " | 🔴 NEW RELEASE" if meta.get('is_new') else ""
+        st.markdown(f"## {sel_movie}", unsafe_allow_html=True)
+        st.markdown(f"#### <small style='color:grey'>({meta.get('rating', 'NR')} | {meta.get('duration', 0)} min {new_tag})</small>", unsafe_allow_html=True)
+
+        with st.expander("🔍 Advanced Filters", expanded=False):
+            f_col1, f_col2, f_col3 = st.columns(3)
+            with f_col1:
+                m_formats = sorted(list(set(s.screen_type for s in m_data)))
+                f_fmt = st.multiselect("Format", options=m_formats, placeholder="All")
+            with f_col2:
+                t_ranges = {"8AM-12N": (8, 12), "12N-4PM": (12, 16), "4PM-8PM": (16, 20), "8PM-12M": (20, 24)}
+                f_win = st.multiselect("Time Window", options=list(t_ranges.keys()))
+            with f_col3:
+                all_m_attrs = set(a for s in m_data for a in s.raw_attrs)
+                f_extra = st.multiselect("Attributes", options=sorted(list(all_m_attrs - set(m_formats))))
+                f_hide = st.checkbox("Hide Past Shows", value=True)
+
+        m_rows &= (day_table.any_of(day_table.screens, f_fmt) &
+                   day_table.in_hours([t_ranges[w] for w in f_win]) &
+                   day_table.all_attrs(f_extra))
+        if f_hide and q_date == current_local_time.date():
+            m_rows &= day_table.after(current_local_time)
+        filtered_m = day_table.select(m_rows)
+
+        week_index = get_week_index()
+        by_fmt = sorted(filtered_m, key=lambda x: (x.screen_type, theater_info.get(x.theater_code, {}).get('time', 999), x.theater_code))
+
+        for fmt, fmt_shows in itertools.groupby(by_fmt, key=lambda x: x.screen_type):
+            with st.expander(f"✨ {fmt}", expanded=True):
+                for tc, t_shows in itertools.groupby(fmt_shows, key=lambda x: x.theater_code):
+                    t_shows = list(t_shows)
+                    info = theater_info.get(tc, {"name": f"Theater {tc}", "dist": 0, "time": 0})
+
+                    is_primary = (tc == t_item['theatre_code'])
+                    t_icon = "📍" if is_primary else "🚗"
+                    dist_txt = "(Current)" if is_primary else f"({info['time']}m / {info['dist']}mi)"
+
+                    st.markdown(f"**{t_icon} {info['name']}** <small style='color:grey'>{dist_txt}</small>", unsafe_allow_html=True)
+
+                    playing_on_dates = week_index.playing_dates(sel_movie, tc, fmt)
+
+                    t_common = set.intersection(*(s.raw_attrs for s in t_shows)) if t_shows else set()
+                    common_attribs = sorted(t_common - {fmt})
+                    st.markdown(f"<p style='color:grey; font-size:0.8rem; margin-top:-10px; margin-bottom:5px;'>({', '.join(common_attribs) if common_attribs else ""})</p>", unsafe_allow_html=True)
+
+                    row_items = []
+                    for s in t_shows:
+                        t_str = s.showtime.strftime('%I:%M %p')
+                        delta_attribs = get_attr_diff(s.attributes, t_common)
+
+                        is_past = (q_date == current_local_time.date() and s.showtime < current_local_time)
+                        if is_past:
+                            final_time = f"<del>{t_str}</del>" 
+                            meta_text = f" <small style='color:grey'><del>(Audi {s.auditorium}) {delta_attribs}</del></small>"
+                        else:    
+                            final_time = f"**{t_str}**"
+                            meta_text = f" <small style='color:grey'>(Audi {s.auditorium}) {delta_attribs}</small>"
+
+                        row_items.append(f"{final_time}{meta_text}")
+
+                    st.markdown(f"&nbsp;&nbsp;&nbsp;&nbsp;{' | '.join(row_items)}", unsafe_allow_html=True)
+
+                    if playing_on_dates:
+                        date_str = ", ".join(playing_on_dates)
+                        st.markdown(f"<p style='font-size: 0.8rem; color: #e67e22; margin-top: -5px;'>🗓️ <b>Scheduled Dates:</b> {date_str}</p>", unsafe_allow_html=True)
+
+                    st.divider()
+
+@st.fragment
+def scheduler_panel(view):
+    # Scheduler parameters, anchor picker and results; parameter changes rerun only this panel
+    t_item, q_date, f_date = view['t_item'], view['q_date'], view['f_date']
+    cluster_theaters, drive_map = view['cluster_theaters'], view['drive_map']
+    debug_mode = view['debug_mode']
+
+    st.subheader("🗓️ Smart Scheduler")
+    st.info(f"Scheduling: **{t_item['name']}** and nearby theaters on **{q_date.strftime('%A, %b %d')}**")
+
+    primary_code = t_item['theatre_code']
+
+    with st.expander("⚙️ Parameters", expanded=True):
+        cached_dates = sorted(list(st.session_state.multi_day_raw.keys()))
+        t_opts = list(cluster_theaters.keys())
+        r1_c1, r1_c2 = st.columns(2)
+
+        with r1_c1:
+            target_theaters = st.multiselect(
+                "1\\. Select Theaters (Ordered by Preference)", 
+                options=t_opts,
+                default=[t_item['theatre_code']],
+                format_func=lambda x: cluster_theaters.get(x),
+                key=f"target_theaters_{t_item['theatre_code']}"
+            )
+
+            target_days = st.multiselect(
+                "2\\. Select Dates", 
+                options=cached_dates,
+                format_func=lambda x: datetime.strptime(x, "%m-%d-%Y").strftime("%b %d"),
+                default=[f_date])
+
+        with r1_c2:
+            target_dates = {datetime.strptime(d_str, "%m-%d-%Y").date() for d_str in target_days}
+            global_reactive_titles = {title for title, by_theater in get_week_index().titles.items()
+                                      if any(target_dates & by_theater.get(tc, {}).keys() for tc in target_theaters)}
+
+            def format_movie_label(title):
+                m_code = st.session_state.get("catalog_titles", {}).get(title)
+                is_new = st.session_state.global_movie_catalog.get(m_code, {}).get('is_new', False)
+                return f"{title} (🔴 NEW)" if is_new else title
+
+            reactive_movies = sorted([t for t in global_reactive_titles if t])
+
+            target_movies = st.multiselect(
+                "3\\. Select Movies (Ordered by Preference)", 
+                options=reactive_movies,
+                format_func=format_movie_label,
+                key=f"target_movies_{t_item['theatre_code']}"
+            )
+
+            n_movies = len(target_movies)
+
+
+            day_table = get_day_table(f_date)
+            format_rows = day_table.matching(day_table.theaters, target_theaters) & day_table.any_of(day_table.titles, target_movies)
+            available_formats = sorted(STRINGS.values[s_id] for s_id, rows in day_table.screens.items() if rows & format_rows)
+
+            target_formats = st.multiselect(
+                "4\\. Preferred Formats", 
+                options=available_formats, 
+                placeholder="All",
+                key=f"target_formats_{t_item['theatre_code']}"
+            )
+
+        time_opts = ["Any Time"] + get_time_options()
+        c1, c2, c3 = st.columns(3)
+        with c1: 
+            sel_start = st.selectbox("Earliest Start", options=time_opts, index=0)
+            sel_end = st.selectbox("Latest End", options=time_opts, index=0)
+            t_start = dt_time(0, 0) if sel_start == "Any Time" else datetime.strptime(sel_start, "%H:%M").time()
+            t_end = dt_time(23, 59) if sel_end == "Any Time" else datetime.strptime(sel_end, "%H:%M").time()
+
+            break_opts = [None] + list(range(1, n_movies)) if n_movies > 1 else [None]
+            b_after = st.selectbox("Long break after movie #", options=break_opts, help="Set a longer break than after a specific movie.")
+        with c2: 
+            buff = st.slider("Buffer (min)", 0, 60, 15, help="Set the minimum gap between two movies")
+            g_cap = st.slider("Max Gap (min)", 30, 240, 120, help="Set the maximum gap between two movies")
+            b_val = st.slider("Break duration (min)", 30, 120, 60)
+            time_limit = st.slider("Search Time Limit (sec)", 1, 60, SEARCH_TIME_LIMIT, help="Stop searching after this long and show the best schedules found so far.")
+        with c3: 
+            unlimited = st.checkbox("Regal Unlimited Rule (90-min gap)", value=True, help="Apply a minimum gap of 90-min between showtimes.")
+            fudge = st.checkbox("Fudge Factor (5-min overlap)", help="Allow a 5 min overlap between showtimes if no better schedule possible.")
+            max_option = n_movies if n_movies > 1 else 1
+            if len(target_days) > 1:
+                max_per_day = st.number_input("Max Movies per Day", min_value=1, max_value=max_option, value=max_option)
+                strategy = st.selectbox(
+                    "Optimization Strategy", 
+                    options=["Minimize Days", "Maximize Compactness"],
+                    help = "Minimize Days will pack your selected movies into the fewest number of trips possible. Maximize Compactness prioritizes the most efficient schedules with the shortest gaps and minimal travel, even if spread across more days.") 
+
+    # --- Anchor Show Selection ---
+    with st.container(border=True):
+        enable_anchor = st.checkbox("📍 Include a Booked (Anchor) Show", value=False)
+        anchor_show = None
+
+        if enable_anchor:
+            st.info("Lock a booked showtime into your plan. The scheduler will build your itinerary around this fixed point, which may limit other options.")
+            a_col1, a_col2, a_col3, a_col4  = st.columns(4)
+            with a_col1:
+                # Filter based on target_theaters
+                a_theater = st.selectbox("Anchor Theater", 
+                                         options=target_theaters, 
+                                         format_func=lambda x: cluster_theaters.get(x))
+            with a_col2:
+                # Filter based on target_days
+                a_day = st.selectbox("Anchor Day", 
+                                     options=target_days,
+                                     format_func=lambda x: datetime.strptime(x, "%m-%d-%Y").strftime("%b %d"))
+            with a_col3:
+                # Pull movies available for that theater and day
+                a_day_data = st.session_state.multi_day_raw.get(a_day)
+                # Intersection of target_movies and what is playing at this specific theater
+                a_date = datetime.strptime(a_day, "%m-%d-%Y").date() if a_day else None
+                week_titles = get_week_index().titles
+                valid_anchor_titles = [t for t in target_movies if a_date in week_titles.get(t, {}).get(a_theater, {})]
+                a_movie = st.selectbox("Anchor Movie", options=sorted(valid_anchor_titles))
+            # Final step: Select the exact showtime
+            with a_col4:
+                a_showtimes = []
+                if a_day_data and a_movie:
+                    anchor_graph = get_day_graph(a_day, primary_code, drive_map)
+                    a_showtimes = sorted([s for (t_id, _), (shows, _) in anchor_graph.index.get(STRINGS.ids.get(a_movie), {}).items() if t_id == STRINGS.ids.get(a_theater) for s in shows],
+                                         key=lambda x: x.showtime)
+
+                selected_anchor = st.selectbox("Anchor Showtime", 
+                                           options=a_showtimes, 
+                                           format_func=lambda x: f"{x.showtime.strftime('%I:%M %p')} ({x.screen_type})")
+                anchor_show = selected_anchor
+
+    # Cancel reruns the script; resume shows whatever the stopped search had found
+    resume_search = st.session_state.pop("resume_search", False)
+    generate = st.button("🚀 Generate Itineraries")
+    # Any other rerun of this panel means the inputs changed, so a search still running is stale
+    running_job = st.session_state.get("search_job")
+    if running_job and not running_job.done and not (generate or resume_search):
+        running_job.cancel()
+    if generate or resume_search:
+        if len(target_movies) < 2:
+            st.error("Please select at least 2 movies.")
+        else:
+            params = {
+                'start': t_start, 'end': t_end, 'buffer': buff, 'gap_cap': g_cap, 
+                'unlimited': unlimited, 'fudge': fudge, 'break_after': b_after, 
+                'long_buffer': b_val, 'formats': target_formats, 'theaters': target_theaters,
+                'primary_code': t_item['theatre_code'], 'time_limit': time_limit,
+                'strategy': strategy if len(target_days) > 1 else "Minimize Days",
+                'max_per_day': max_per_day if len(target_days) > 1 else n_movies
+            }
+
+            if len(target_days) > 1:
+                plan_stats = {}
+                multi_itinerary = find_multi_day_itineraries(target_movies, target_days, params, drive_map,anchor_show, stats=plan_stats)
+                if debug_mode and plan_stats.get('pool_error'):
+                    st.caption(f"🛠️ Planning pool failed, so the plan was searched in this process: {plan_stats['pool_error']}")
+
+                if not multi_itinerary:
+                    st.error("Could not find a valid multi-day schedule for these movies. Consider expanding selections and broadening filters.")
+                else:
+                    st.success(f"🗓️ Multi-Day Plan Generated: {len(multi_itinerary)} days used.")
+
+                    total_movies = sum(len(p) for p in multi_itinerary.values())
+                    total_hops = sum(calculate_path_score(p, params['primary_code'], drive_map)['hops'] for p in multi_itinerary.values())
+                    sorted_plan_days = sorted(multi_itinerary.keys(), key=lambda x: datetime.strptime(x, '%m-%d-%Y'))
+                    scheduled_titles = [s.title for p in multi_itinerary.values() for s in p]
+                    unscheduled = [m for m in target_movies if m not in scheduled_titles]
+
+                    st.markdown(f"### 🏆 Schedule Summary")
+                    c1, c2, c3 = st.columns(3)
+                    c1.metric("Total Movies", f"{total_movies} / {len(target_movies)}")
+                    c2.metric("Total Days", len(multi_itinerary))
+                    c3.metric("Total Hops", total_hops)
+
+                    timeline_html = "<div style='display: flex; gap: 5px; margin-bottom: 20px;'>"
+                    for d_str in sorted_plan_days:
+                        color = "#2ecc71" if d_str in multi_itinerary else "#ecf0f1"
+                        label = datetime.strptime(d_str, '%m-%d-%Y').strftime('%A, %b %d')
+                        count = len(multi_itinerary[d_str]) if d_str in multi_itinerary else 0
+                        timeline_html += f"""
+                        <div style='background-color: {color}; padding: 10px; border-radius: 5px; text-align: center; flex: 1; border: 1px solid #bdc3c7; min-width: 80px;'>
+                            <div style='font-size: 0.7rem; color: #7f8c8d;'>{label}</div>
+                            <div style='font-weight: bold;'>{count} 🎬</div>
+                        </div>"""
+                    timeline_html += "</div>"
+                    st.markdown(timeline_html, unsafe_allow_html=True)
+
+                    st.download_button("📅 Download ICS for Full Schedule", 
+                                            generate_batch_ics(multi_itinerary, cluster_theaters), 
+                                            file_name=f"movies_multi_full.ics", 
+                                            mime="text/calendar", 
+                                            key=f"dl_multi_full")
+
+                    if not unscheduled:
+                        st.success("✅ **Perfect Match!** All selected movies fit the schedule.")
+                    else:
+                        st.warning(f"⚠️ **Incomplete Schedule:** {len(unscheduled)} movies could not be fitted.")
+
+                    for d_str in sorted_plan_days:
+                        path = multi_itinerary[d_str]
+                        d_display = datetime.strptime(d_str, '%m-%d-%Y').strftime('%A, %b %d')
+                        stats = calculate_path_score(path, params['primary_code'], drive_map)
+
+                        with st.container(border=True):
+                            st.markdown(f"#### 📅 {d_display}")
+                            st.markdown(f"🎬 **{len(path)} Movies** | 🚗 {stats['hops']} Hops | ⏱️ {stats['gap']}m Total Gap")
+
+                            for idx, s in enumerate(path):
+                                t_name = cluster_theaters.get(s.theater_code, "Unknown")
+                                start_t = s.showtime.strftime('%I:%M %p')
+                                end_t = s.end_time.strftime('%I:%M %p')
+
+                                st.write(f"🕒 **{start_t} - {end_t}**: {s.title} (**{s.screen_type}**) @{t_name}")
+
+                                if idx < len(path) - 1:
+                                    next_s = path[idx + 1]
+                                    gap = next_s.start - s.end
+                                    drive_info = ""
+                                    if s.theater_code != next_s.theater_code:
+                                        drive_time, drive_miles = drive_map.drive(s.theater_code, next_s.theater_code)
+                                        drive_info = f". Drive: {drive_time} mins ({drive_miles} mi)"
+                                    st.markdown(f"&nbsp;&nbsp;&nbsp;&nbsp;<small style='color:grey'>Gap: {gap} mins{drive_info}</small>", unsafe_allow_html=True)
+
+                            st.download_button("📅 Download ICS for Day", 
+                                            generate_ics(path, cluster_theaters[params['primary_code']]), 
+                                            file_name=f"movies_{d_str}.ics", 
+                                            mime="text/calendar", 
+                                            key=f"dl_multi_{d_str}")
+
+                    if unscheduled:
+                        with st.expander("⚠️ Unscheduled Movies"):
+                            for m in unscheduled:
+                                st.write(f"❌ **{m}**: Could not fit into the selected time windows or theater constraints.")
+
+            else:
+                sched_date_str = target_days[0]
+                sched_date_obj = datetime.strptime(sched_date_str, '%m-%d-%Y').date()
+                sched_graph = get_day_graph(sched_date_str, primary_code, drive_map)
+                def show_options(selections, final=True):
+                    # Option cards; previews drawn while the search runs leave out the widgets
+                    for i, (entry, label) in enumerate(selections[:5]):
+                        path, count, hops, miles = entry['path'], entry['count'], entry['hops'], entry['miles']
+                        with st.container(border=True):
+                            st.markdown(f"#### Option {i+1}: {count} Movies")
+                            st.markdown(f"🏆 **{label}** | 🚗 {hops} Hops ({round(miles, 1)} mi travel)", unsafe_allow_html=True)
+
+                            for idx, s in enumerate(path):
+                                t_name = cluster_theaters.get(s.theater_code, "Unknown")
+                                start_t, end_t = s.showtime, s.end_time
+                                st.write(f"🕒 **{start_t.strftime('%I:%M %p')} - {end_t.strftime('%I:%M %p')}**: {s.title} (**{s.screen_type}**) @{t_name}")
+
+                                if idx < len(path) - 1:
+                                    next_s = path[idx + 1]
+                                    gap = next_s.start - s.end
+                                    drive_info = ""
+                                    if s.theater_code != next_s.theater_code:
+                                        drive_time, drive_miles = drive_map.drive(s.theater_code, next_s.theater_code)
+                                        drive_info = f". Drive: {drive_time} mins ({drive_miles} mi)"
+                                    st.markdown(f"&nbsp;&nbsp;&nbsp;&nbsp;<small style='color:grey'>Gap: {gap} mins{drive_info}</small>", unsafe_allow_html=True)
+
+                            if not final:
+                                continue
+                            st.divider()
+                            st.download_button("📅 Download ICS", 
+                                            generate_ics(path, t_item['name']), 
+                                            file_name=f"movies_{q_date}.ics", 
+                                            mime="text/calendar", 
+                                            key=f"dl_{i}_{'-'.join(map(str, entry['id']))}")
+
+                            if count < len(target_movies):
+                                missing = [t for t in target_movies if t not in [s.title for s in path]]
+                                with st.expander("⚠️ Why were some movies left out?"):
+                                    report = get_conflict_report(path, missing, sched_graph, params, anchor_show, drive_map)
+                                    for line in report: st.write(line)
+
+                if sched_graph:
+                    search_job = st.session_state.get("search_job")
+                    if not (resume_search and search_job):
+                        if search_job:
+                            search_job.cancel()
+                        search_job = SearchJob(target_movies, sched_graph, params, sched_date_obj, drive_map, anchor=anchor_show)
+                        st.session_state.search_job = search_job
+
+                    def cancel_search(job=search_job):
+                        job.cancel()
+                        st.session_state.resume_search = True
+
+                    progress = st.empty()
+                    if not search_job.done:
+                        st.button("⏹️ Cancel Search", on_click=cancel_search)
+                    preview, shown = st.empty(), None
+                    while not search_job.done:
+                        collector = search_job.collector
+                        best = max(search_job.paths, key=len, default=[])
+                        progress.info(f"⏳ Searching... {time.monotonic() - search_job.started:.1f}s elapsed"
+                                      + (f" | Best so far: {len(best)} movies" if best else ""))
+                        if collector is not shown:
+                            with preview.container():
+                                show_options(collector.selections(), final=False)
+                            shown = collector
+                        search_job.thread.join(0.25)
+                    progress.empty()
+                    preview.empty()
+
+                    collector, search_stats = search_job.collector, search_job.stats
+                    if search_job.timed_out:
+                        st.caption(f"⏱️ Search Time Limit reached after {time_limit}s. Showing the best schedules found so far.")
+                    elif search_job.stop.is_set():
+                        st.caption("⏹️ Search cancelled. Showing the best schedules found so far.")
+                    if debug_mode and search_stats:
+                        st.caption(f"🛠️ Search expanded {search_stats['nodes']:,} nodes.")
+                    final_selections = collector.selections()
+                else:
+                    final_selections = []
+
+                if not final_selections: 
+                    st.error("No valid schedules found. Consider expanding selections and broadening filters.")
+                else:
+                    show_options(final_selections)
+
 # --- Main App ---
-if "global_movie_catalog" not in st.session_state:
-    st.session_state.global_movie_catalog = {}
+# Planning workers are spawned processes that import this script as __mp_main__; only the
+# definitions above are wanted there, not the page itself
+if __name__ == "__main__":
+    if "global_movie_catalog" not in st.session_state:
+        st.session_state.global_movie_catalog = {}
 
-if "multi_day_raw" not in st.session_state:
-        st.session_state.multi_day_raw = {}
+    if "multi_day_raw" not in st.session_state:
+            st.session_state.multi_day_raw = {}
 
-if "theater_future_cache" not in st.session_state:
-    st.session_state.theater_future_cache = {}
+    if "theater_future_cache" not in st.session_state:
+        st.session_state.theater_future_cache = {}
 
-st.title("🎬 Regal Pro")
-theaters = load_theaters()
+    st.title("🎬 Regal Pro")
+    registry = get_theater_registry()
 
-if "init_complete" not in st.session_state:
-    url_t_code = st.query_params.get("theater")
-    st.session_state.search_mode_pref = "Theater Code" if url_t_code else "Zip Code"
-    st.session_state.init_complete = True
-    st.session_state.initial_url_code = url_t_code
-else:
-    url_t_code = None
+    if "init_complete" not in st.session_state:
+        url_t_code = st.query_params.get("theater")
+        st.session_state.search_mode_pref = "Theater Code" if url_t_code else "Zip Code"
+        st.session_state.init_complete = True
+        st.session_state.initial_url_code = url_t_code
+    else:
+        url_t_code = None
 
-location, latitude,longitude, default_zip_code = get_location_cookie()
+    location, latitude,longitude, default_zip_code = get_location_cookie()
 
-results = []
-search_performed = False
+    results = []
+    search_performed = False
 
-st.sidebar.header("📍 Find Theater")
+    st.sidebar.header("📍 Find Theater")
 
-search_mode = st.sidebar.selectbox(
-    "Search By", 
-    ["Zip Code", "Theater Name", "Address/City", "Theater Code"],
-    index=["Zip Code", "Theater Name", "Address/City", "Theater Code"].index(st.session_state.search_mode_pref),
-    key="current_search_mode"
-)
+    search_mode = st.sidebar.selectbox(
+        "Search By", 
+        ["Zip Code", "Theater Name", "Address/City", "Theater Code"],
+        index=["Zip Code", "Theater Name", "Address/City", "Theater Code"].index(st.session_state.search_mode_pref),
+        key="current_search_mode"
+    )
 
-if search_mode == "Theater Code":
-    val = st.session_state.get('initial_url_code', "")
-    code_in = st.sidebar.text_input("Theater Code", value=val)
+    if search_mode == "Theater Code":
+        val = st.session_state.get('initial_url_code', "")
+        code_in = st.sidebar.text_input("Theater Code", value=val)
     
-    if "initial_url_code" in st.session_state and code_in != st.session_state.initial_url_code:
-        del st.session_state.initial_url_code
-
-    if code_in:
-        search_performed = True
-        match = next((t for t in theaters if t['item']['theatre_code'] == code_in), None)
-        if match:
-            results = [match]
-            if 'nearby_theaters' in match['item']:
-                nearby_codes = [n['code'] for n in match['item']['nearby_theaters']]
-                results.extend([t for t in theaters if t['item']['theatre_code'] in nearby_codes])
-elif search_mode == "Zip Code":
-    zip_in = st.sidebar.text_input("Zip Code", placeholder="46201", value=default_zip_code)
-    radius_in = st.sidebar.slider("Radius (miles)", 5, 200, 50)
+        if "initial_url_code" in st.session_state and code_in != st.session_state.initial_url_code:
+            del st.session_state.initial_url_code
+
+        if code_in:
+            search_performed = True
+            results = registry.cluster(code_in)
+    elif search_mode == "Zip Code":
+        zip_in = st.sidebar.text_input("Zip Code", placeholder="46201", value=default_zip_code)
+        radius_in = st.sidebar.slider("Radius (miles)", 5, 200, 50)
     
-    if zip_in:
-        search_performed = True
-        results = []
-        nomi = pgeocode.Nominatim('us')
-        z_data = nomi.query_postal_code(zip_in)
-        if not math.isnan(z_data['latitude']):
-            for t in theaters:
-                d = calculate_haversine_distance(z_data['latitude'], z_data['longitude'], t['item']['latitude'], t['item']['longitude'])
-                if d <= radius_in: results.append((t, d))
-            results.sort(key=lambda x: x[1])
-    elif location and not math.isnan(latitude):
-        for t in theaters:
-            d = calculate_haversine_distance(latitude, longitude, t['item']['latitude'], t['item']['longitude'])
-            if d <= 50: results.append((t, d))
-        results.sort(key=lambda x: x[1])
-elif search_mode == "Theater Name":
-    name_in = st.sidebar.text_input("Theater Name")
-    if name_in: search_performed = True; results = [t for t in theaters if name_in.lower() in t['item']['name'].lower()]
-elif search_mode == "Address/City":
-    addr_in = st.sidebar.text_input("Address, City, or State")
-    if addr_in: search_performed = True; results = [t for t in theaters if any(addr_in.lower() in t['item'].get(f, '').lower() for f in ['address', 'city', 'state'])]
-
-if search_performed and not results: st.sidebar.warning("No theaters found matching your criteria.")
-
-selected_theater = None
-
-if results:
-    opts = {f"{r[0]['item']['name'] if isinstance(r, tuple) else r['item']['name']} - {r[0]['item']['city'] if isinstance(r, tuple) else r['item']['city']}": (r[0] if isinstance(r, tuple) else r) for r in results}    
+        if zip_in:
+            search_performed = True
+            results = []
+            centroid = get_zip_table().get(zip_in)
+            if centroid:
+                results = get_theater_grid().within(*centroid, radius_in)
+        elif location and not math.isnan(latitude):
+            results = get_theater_grid().within(latitude, longitude, 50)
+    elif search_mode == "Theater Name":
+        name_in = st.sidebar.text_input("Theater Name")
+        if name_in: search_performed = True; results = registry.search_name(name_in)
+    elif search_mode == "Address/City":
+        addr_in = st.sidebar.text_input("Address, City, or State")
+        if addr_in: search_performed = True; results = registry.search_address(addr_in)
+
+    if search_performed and not results: st.sidebar.warning("No theaters found matching your criteria.")
+
+    selected_theater = None
+
+    if results:
+        opts = {f"{r[0]['item']['name'] if isinstance(r, tuple) else r['item']['name']} - {r[0]['item']['city'] if isinstance(r, tuple) else r['item']['city']}": (r[0] if isinstance(r, tuple) else r) for r in results}    
     
-    if "active_theater_code" not in st.session_state:
-        st.session_state.active_theater_code = st.query_params.get("theater")
+        if "active_theater_code" not in st.session_state:
+            st.session_state.active_theater_code = st.query_params.get("theater")
     
-    idx = 0
-    for i, t in enumerate(opts.values()):
-        if t['item']['theatre_code'] == st.session_state.active_theater_code: 
-            idx = i
-            break
-
-    sel_label = st.sidebar.selectbox("Select Theater", options=list(opts.keys()), index=idx)
-    selected_theater = opts[sel_label]
-    new_code = selected_theater['item']['theatre_code']
-
-    if new_code != st.session_state.active_theater_code:
-        st.session_state.active_theater_code = new_code
-        st.query_params["theater"] = new_code
-        st.rerun()
-
-if selected_theater:
-    t_item = selected_theater['item']
-    cluster_theaters = {t_item['theatre_code']: t_item['name']}
-    master_name_map = {t['item']['theatre_code']: t['item']['name'] for t in theaters}
-    drive_map = {t_item['theatre_code']: {'time': 0, 'dist': 0}}
-
-    if 'nearby_theaters' in t_item:
-        for nt in t_item['nearby_theaters']:
+        idx = 0
+        for i, t in enumerate(opts.values()):
+            if t['item']['theatre_code'] == st.session_state.active_theater_code: 
+                idx = i
+                break
+
+        sel_label = st.sidebar.selectbox("Select Theater", options=list(opts.keys()), index=idx)
+        selected_theater = opts[sel_label]
+        new_code = selected_theater['item']['theatre_code']
+
+        if new_code != st.session_state.active_theater_code:
+            st.session_state.active_theater_code = new_code
+            st.query_params["theater"] = new_code
+            st.rerun()
+
+    if selected_theater:
+        t_item = selected_theater['item']
+        cluster_theaters = {t_item['theatre_code']: t_item['name']}
+        drive_map = get_drive_matrix(t_item['theatre_code'])
+
+        for nt in registry.neighbors.get(t_item['theatre_code'], ()):
             n_code = nt['code']
-            n_name = master_name_map.get(n_code, nt.get('name', f"Theater {n_code}"))
-            cluster_theaters[n_code] = n_name
-            drive_map[n_code] = {
-                    'time': nt.get('drive_min', 20),
-                    'dist': nt.get('road_miles', 0)
-                }
+            cluster_theaters[n_code] = registry.names.get(n_code, nt.get('name', f"Theater {n_code}"))
 
-    q_date = st.sidebar.date_input("Select Date", value="today", format="MM/DD/YYYY")
+        q_date = st.sidebar.date_input("Select Date", value="today", format="MM/DD/YYYY")
 
-    t_lon = t_item.get('longitude')
-    t_state = t_item.get('state_code')
-    if t_lon:
-        new_offset = get_offset_from_lon(t_lon,
-                                         t_state,
-                                         target_date=datetime.combine(q_date, dt_time(0,0)))
-        st.session_state.auto_tz_offset = new_offset
+        t_lon = t_item.get('longitude')
+        t_state = t_item.get('state_code')
+        if t_lon:
+            new_offset = get_offset_from_lon(t_lon,
+                                             t_state,
+                                             target_date=datetime.combine(q_date, dt_time(0,0)))
+            st.session_state.auto_tz_offset = new_offset
 
-    f_date = q_date.strftime('%m-%d-%Y')
+        f_date = q_date.strftime('%m-%d-%Y')
 
-    needs_fetch = True
-    date_range = [q_date + timedelta(days=i) for i in range(7)]
-    target_codes = list(cluster_theaters.keys())
+        needs_fetch = True
+        date_range = [q_date + timedelta(days=i) for i in range(7)]
+        target_codes = list(cluster_theaters.keys())
 
-    if "multi_day_raw" not in st.session_state:
-        st.session_state.multi_day_raw = {}
+        if "multi_day_raw" not in st.session_state:
+            st.session_state.multi_day_raw = {}
         
-    days_to_fetch = [d.strftime('%m-%d-%Y') for d in date_range 
-                    if d.strftime('%m-%d-%Y') not in st.session_state.multi_day_raw]
+        in_flight = {d_str for _, d_str in st.session_state.get("sync_jobs", {}).values()}
+        failed_days = {d_str for d_str, n in st.session_state.get("sync_failed", {}).items() if n >= SYNC_DAY_ATTEMPTS}
+        days_to_fetch = [d.strftime('%m-%d-%Y') for d in date_range 
+                        if d.strftime('%m-%d-%Y') not in st.session_state.multi_day_raw and d.strftime('%m-%d-%Y') not in in_flight
+                        and d.strftime('%m-%d-%Y') not in failed_days]
 
-    status_context = st.status("🛠️ Debug: Detailed Sync Log", expanded=True) if debug_mode else None
+        status_context = st.status("🛠️ Debug: Detailed Sync Log", expanded=True) if debug_mode else None
+        sync_msg = None
 
-    if days_to_fetch:
-        msg = st.toast(f"🔍 Synchronizing 7-Day Data for {t_item['name']}...")
-        for d_str in days_to_fetch:
-            log_msg = f"🌐 Fetching {d_str}..."
-            msg.toast(log_msg)
-            if status_context: status_context.write(log_msg)
-            api_url = f"https://www.regmovies.com/api/getShowtimes?theatres={','.join(target_codes)}&date={d_str}"
-            data = fetch_data(api_url, t_item['path_name'],status_context)
-            
-            if data:
-                all_flat_data, _, _, _ = flatten_data(data)
-                gaps = check_metadata_gaps(all_flat_data)
-                
-                if gaps:
-                    anchor_theaters = list(set(gaps.values()))
-                    for anchor in anchor_theaters:
-                        t_name = cluster_theaters.get(anchor, anchor)
-                        sweep_msg = f"🩹 Metadata gap fill: {d_str} via {t_name}"
-                        msg.toast(sweep_msg)
-                        if status_context: status_context.write(sweep_msg)
-                        rotated = [anchor] + [c for c in target_codes if c != anchor]
-                        sweep_url = f"https://www.regmovies.com/api/getShowtimes?theatres={','.join(rotated)}&date={d_str}"
-                        sweep_data = fetch_data(sweep_url, t_item['path_name'],status_context)
-                        if sweep_data:
-                            flatten_data(sweep_data)
-                
-                st.session_state.multi_day_raw[d_str] = data
-            
-            msg.toast("🎉 7-Day Sync Complete!")
-            if status_context: status_context.update(label="Sync Log Finished", state="complete", expanded=False)
+        if days_to_fetch or in_flight:
+            sync_msg = st.toast(f"🔍 Synchronizing 7-Day Data for {t_item['name']}...")
+            start_day_sync(days_to_fetch, target_codes, t_item['path_name'], status_context, sync_msg)
+            # Only wait for the selected day here; the rest of the week is merged after the page renders
+            drain_day_sync(target_codes, t_item, cluster_theaters, status_context, sync_msg, until=f_date)
 
-    current_day_data = st.session_state.multi_day_raw.get(f_date)
+        current_day_data = st.session_state.multi_day_raw.get(f_date)
 
-    if "theater_future_cache" not in st.session_state:
-        st.session_state.theater_future_cache = {}
+        if "theater_future_cache" not in st.session_state:
+            st.session_state.theater_future_cache = {}
     
-    current_t_code = selected_theater['item']['theatre_code']
+        current_t_code = selected_theater['item']['theatre_code']
 
-    if current_t_code not in st.session_state.theater_future_cache:
-        log_msg = f"📡 Fetching upcoming schedule for {selected_theater['item']['name']}..."
-        st.toast(log_msg)
-        if status_context: status_context.write(log_msg)
+        if current_t_code not in st.session_state.theater_future_cache:
+            log_msg = f"📡 Fetching upcoming schedule for {selected_theater['item']['name']}..."
+            st.toast(log_msg)
+            if status_context: status_context.write(log_msg)
 
-        api_url = f"https://www.regmovies.com/api/getShowtimes?theatres={current_t_code}&date={f_date}"
-        future_data = fetch_data(api_url, selected_theater['item']['path_name'],status_context)
+            api_url = f"https://www.regmovies.com/api/getShowtimes?theatres={current_t_code}&date={f_date}"
+            future_data = fetch_data(api_url, selected_theater['item']['path_name'],status_context)
         
-        if future_data:
-            _, _, _, new_future_map = flatten_data(future_data)
-            st.session_state.theater_future_cache.update(new_future_map)
-
-    with st.sidebar.expander("⚙️ Advanced Settings", expanded=False):
-        st.write("🕒 Timezone Settings")
-        local_now = datetime.now()
-        utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
-        system_offset = round((local_now - utc_now).total_seconds() / 3600)
-        default_offset = st.session_state.get('auto_tz_offset', system_offset)
-        tz_offset = st.number_input("Selected Location Offset from UTC", value=int(default_offset), step=1)
-        current_local_time = (datetime.now(timezone.utc) + timedelta(hours=tz_offset)).replace(tzinfo=None)
-        st.write(f"Local Time for Selected Location: **{current_local_time.strftime('%I:%M %p')}**")
-        st.divider()
-        if st.button("🔄 Force Refresh"): st.session_state.last_fetch_key = None
-        print_mode = st.checkbox("🖨️ Print View")
-        debug_mode = st.checkbox("🐞 Debug Mode", value=debug_mode, help="Show raw API responses for troubleshooting.")
-        status_label, ext_ip = get_proxy_health()
+            if future_data:
+                _, _, _, new_future_map = flatten_data(future_data)
+                st.session_state.theater_future_cache.update(new_future_map)
+
+        with st.sidebar.expander("⚙️ Advanced Settings", expanded=False):
+            st.write("🕒 Timezone Settings")
+            local_now = datetime.now()
+            utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+            system_offset = round((local_now - utc_now).total_seconds() / 3600)
+            default_offset = st.session_state.get('auto_tz_offset', system_offset)
+            tz_offset = st.number_input("Selected Location Offset from UTC", value=int(default_offset), step=1)
+            current_local_time = local_time(tz_offset)
+            st.write(f"Local Time for Selected Location: **{current_local_time.strftime('%I:%M %p')}**")
+            st.divider()
+            if st.button("🔄 Force Refresh"):
+                st.session_state.last_fetch_key = None
+                st.session_state.pop("sync_failed", None)
+                st.rerun()
+            print_mode = st.checkbox("🖨️ Print View")
+            debug_mode = st.checkbox("🐞 Debug Mode", value=debug_mode, help="Show raw API responses for troubleshooting.")
+            if debug_mode:
+                flight_stats = get_request_flights().stats
+                st.caption(f"🛠️ API calls: {flight_stats['fetched']} fetched, {flight_stats['hits']} cache hits, {flight_stats['coalesced']} coalesced")
+            status_label, ext_ip = get_proxy_health()
         
-        if status_label == "Active":
-            st.success(f"🌐 **Proxy:** {status_label}")
-            st.caption(f"Masked IP: `{ext_ip.split(',')[0]}`")
-        elif status_label == "Local Bypass":
-            st.info(f"🏠 **Mode:** {status_label}")
-            st.caption("Direct Connection Active")
-        else:
-            st.error(f"⚠️ **Proxy:** {status_label}")
-            st.caption("Check Streamlit Secrets or Decodo Balance")
+            if status_label == "Active":
+                st.success(f"🌐 **Proxy:** {status_label}")
+                st.caption(f"Masked IP: `{ext_ip.split(',')[0]}`")
+            elif status_label == "Local Bypass":
+                st.info(f"🏠 **Mode:** {status_label}")
+                st.caption("Direct Connection Active")
+            else:
+                st.error(f"⚠️ **Proxy:** {status_label}")
+                st.caption("Check Streamlit Secrets or Decodo Balance")
 
-st.sidebar.link_button("🐞 Report a Bug","https://docs.google.com/forms/d/e/1FAIpQLSce6X3DtCwDJZUjf_Cc4IbJLA7q0Nvk_Grw7lOgyqLtxYIYPQ/viewform?usp=dialog")
-st.sidebar.link_button("☕ Buy Me a Coffee","https://buymeacoffee.com/riyazusman")
-st.sidebar.link_button("📃 Source on Github","https://github.com/riyazusman/regal-pro")
+    st.sidebar.link_button("🐞 Report a Bug","https://docs.google.com/forms/d/e/1FAIpQLSce6X3DtCwDJZUjf_Cc4IbJLA7q0Nvk_Grw7lOgyqLtxYIYPQ/viewform?usp=dialog")
+    st.sidebar.link_button("☕ Buy Me a Coffee","https://buymeacoffee.com/riyazusman")
+    st.sidebar.link_button("📃 Source on Github","https://github.com/riyazusman/regal-pro")
 
-if selected_theater and current_day_data:
-    if debug_mode:
-        with st.expander("🛠️ Raw API Debug Output", expanded=False):
-            st.json(current_day_data)
+    if selected_theater and current_day_data:
+        if debug_mode:
+            with st.expander("🛠️ Raw API Debug Output", expanded=False):
+                st.json(current_day_data)
 
-    all_flat_data, movie_meta, attr_map, future_movies = flatten_data(current_day_data)        
-    flat_data = [s for s in all_flat_data if s['TheaterCode'] == t_item['theatre_code']]
+        all_flat_data, movie_meta, attr_map, future_movies = get_flat_day(f_date)
+        flat_data = [s for s in all_flat_data if s.theater_code == t_item['theatre_code']]
         
-    st.session_state.update({
-        "all_flat_data": all_flat_data,
-        "flat_data": flat_data,
-        "movie_meta": movie_meta,
-        "attr_map": attr_map,
-        "future_movies": future_movies
-    })
-
-    if 'flat_data' in st.session_state:
-        flat_data = st.session_state.flat_data
-        all_flat_data = st.session_state.all_flat_data
-        movie_meta = st.session_state.movie_meta
-        attr_map = st.session_state.attr_map
-        future_movies = st.session_state.future_movies
-
-    t_key = t_item['theatre_code']
-    nav_key = f"nav_tab_{t_key}"
-
-    tabs_list = ["🔎 Theater Explorer", "🎬 Movie Explorer", "🗓️ Smart Scheduler"]
-    default_idx = 0
-    if "nav_redirect" in st.session_state:
-        st.session_state[nav_key] = st.session_state.nav_redirect
-        del st.session_state.nav_redirect
-
-    nav_tab = st.radio(
-            "Navigation", 
-            ["🔎 Theater Explorer", "🎬 Movie Explorer", "🗓️ Smart Scheduler"], 
-            horizontal=True, 
-            label_visibility="collapsed",
-            key=nav_key
-        )
+        st.session_state.update({
+            "all_flat_data": all_flat_data,
+            "flat_data": flat_data,
+            "movie_meta": movie_meta,
+            "attr_map": attr_map,
+            "future_movies": future_movies
+        })
+
+        if 'flat_data' in st.session_state:
+            flat_data = st.session_state.flat_data
+            all_flat_data = st.session_state.all_flat_data
+            movie_meta = st.session_state.movie_meta
+            attr_map = st.session_state.attr_map
+            future_movies = st.session_state.future_movies
+
+        t_key = t_item['theatre_code']
+        nav_key = f"nav_tab_{t_key}"
+
+        # Day state shared by the panel fragments below
+        view = {
+            't_item': t_item, 'q_date': q_date, 'f_date': f_date, 'tz_offset': tz_offset,
+            'cluster_theaters': cluster_theaters, 'drive_map': drive_map,
+            'flat_data': flat_data, 'all_flat_data': all_flat_data, 'movie_meta': movie_meta,
+            'print_mode': print_mode, 'debug_mode': debug_mode
+        }
+
+        tabs_list = ["🔎 Theater Explorer", "🎬 Movie Explorer", "🗓️ Smart Scheduler"]
+        default_idx = 0
+        if "nav_redirect" in st.session_state:
+            st.session_state[nav_key] = st.session_state.nav_redirect
+            del st.session_state.nav_redirect
+
+        nav_tab = st.radio(
+                "Navigation", 
+                ["🔎 Theater Explorer", "🎬 Movie Explorer", "🗓️ Smart Scheduler"], 
+                horizontal=True, 
+                label_visibility="collapsed",
+                key=nav_key
+            )
 
-    if nav_tab == "🔎 Theater Explorer":
-        if print_mode: st.markdown("<style>[data-testid='stSidebar'], [data-testid='stHeader'] {display: none;} .stExpander {border: none !important;}</style>", unsafe_allow_html=True)
-        st.subheader("🔎 Theater Explorer")
-        st.info(f"Viewing: **{t_item['name']}** on **{q_date.strftime('%A, %b %d')}**")
+        if nav_tab == "🔎 Theater Explorer":
+            if print_mode: st.markdown("<style>[data-testid='stSidebar'], [data-testid='stHeader'] {display: none;} .stExpander {border: none !important;}</style>", unsafe_allow_html=True)
+            st.subheader("🔎 Theater Explorer")
+            st.info(f"Viewing: **{t_item['name']}** on **{q_date.strftime('%A, %b %d')}**")
 
-        tab_now, tab_nearby, tab_upcoming = st.tabs(["🍿 Now Playing", "🚗 Playing Nearby", "📅 Upcoming"])
+            tab_now, tab_nearby, tab_upcoming = st.tabs(["🍿 Now Playing", "🚗 Playing Nearby", "📅 Upcoming"])
         
-        with tab_now:
-            st.subheader("🍿 Now Playing")
-            st.caption(f"These movies are playing today at {t_item['name']}.")
-
-            with st.expander("🔍 Filters & Sorting", expanded=not print_mode):
-                c1, c2, c3, c4 = st.columns(4)
-                with c1:
-                    f_type = st.multiselect("Screen Type", 
-                                            options=sorted(list(set(s['ScreenType'] for s in flat_data))), 
-                                            placeholder="All",
-                                            key=f"f_type_{t_key}")
-                    f_rating = st.multiselect("Rating", 
-                                              options=sorted(list(set(s['Rating'] for s in flat_data))), 
-                                              placeholder="All",
-                                              key=f"f_rating_{t_key}")
-                with c2:
-                    f_audi = st.multiselect("Auditorium", 
-                                            options=sorted(list(set(s['Auditorium'] for s in flat_data)), key=lambda x: int(x) if x.isdigit() else 999), 
-                                            placeholder="All",
-                                            key=f"f_audi_{t_key}")
-                    
-                    current_st = set(f_type) if f_type else set(s['ScreenType'] for s in flat_data)
-                    all_expanded_attrs = set(a for s in flat_data for a in s['raw_attrs'])
-                    deduped_attrs = sorted([a for a in all_expanded_attrs if a not in current_st])
-                    
-                    f_attr = st.multiselect("Additional Filters", 
-                                            options=deduped_attrs, 
-                                            placeholder="All",
-                                            key=f"f_attr_{t_key}")
-                with c3:
-                    t_ranges = {"8AM - 12N": (8, 12), "12N - 4PM": (12, 16), "4PM - 8PM": (16, 20), "8PM - 12M": (20, 24)}
-                    f_times = st.multiselect("Time Window", 
-                                             options=list(t_ranges.keys()), 
-                                             placeholder="All",
-                                             key=f"f_times_{t_key}")
-                    f_avail = st.checkbox("Hide past shows", value=True, key=f"f_avail_{t_key}")
-                    f_new = st.checkbox("New Releases Only", value=False, key=f"f_new_{t_key}")
-                with c4:
-                    sort_by = st.selectbox("Sort By", 
-                                           ["Movie Title", "Showtime", "Auditorium"],
-                                           key=f"sort_by_{t_key}")
-                    view_mode = st.selectbox("View Mode", 
-                                             ["Group by Movie", "Group by Auditorium", "Full Schedule"],
-                                             key=f"view_mode_{t_key}")
-                    
-            filtered = [s for s in flat_data if (
-                not f_type or s['ScreenType'] in f_type) and 
-                (not f_rating or s['Rating'] in f_rating) and 
-                (not f_audi or s['Auditorium'] in f_audi) and 
-                (not f_attr or set(f_attr).issubset(s['raw_attrs'])) and 
-                (not f_times or any(t_ranges[t][0] <= s['Showtime'].hour < t_ranges[t][1] for t in f_times)) and 
-                (not f_avail or (s['Showtime'] > current_local_time if q_date == current_local_time.date() else True)) and
-                (not f_new or movie_meta.get(s['master_code'], {}).get('is_new', False))]
-            
-            if sort_by == "Movie Title": filtered.sort(key=lambda x: (x['Title'], x['Showtime']))
-            elif sort_by == "Showtime": filtered.sort(key=lambda x: (x['Showtime'], x['Title']))
-            elif sort_by == "Auditorium": filtered.sort(key=lambda x: (int(x['Auditorium']) if x['Auditorium'].isdigit() else 999, x['Showtime']))
-            
-            st.write(f"Showing **{len(set(s['Title'] for s in filtered))}** movies and **{len(filtered)}** screenings.")
-
-            if view_mode == "Full Schedule":
-                for s in filtered:
-                    with st.container(border=True):
-                        col_t, col_info = st.columns([1.3, 5])
-                        is_past = (q_date == current_local_time.date() and s['Showtime'] < current_local_time)
-                        t_str = f"<span style=\"text-decoration: line-through;\">{s['Showtime'].strftime('%I:%M %p')}</span>" if is_past else f"{s['Showtime'].strftime('%I:%M %p')}"
-                        d_str = f"~~{s['Title']}~~" if is_past else s['Title']
-                        col_t.markdown(f"""<div style="line-height: 1;"><p style="color: grey; font-size: 0.8rem; margin-bottom: 2px; text-transform: uppercase; font-weight: bold;">{s['ScreenType']}</p><p style="font-size: 1.4rem; font-weight: 700; margin: 0; white-space: nowrap;">{t_str}</p></div>""", unsafe_allow_html=True)
-                        col_info.markdown(f"### {d_str}")
-                        col_info.markdown(f"**{s['Rating']}** | **{s['Duration']} min** | Audi {s['Auditorium']}")
-                        if s['Attributes']: st.markdown(f'<p style="color: grey; font-size: 0.85em; margin-top: -10px;">{s["Attributes"]}</p>', unsafe_allow_html=True)
-            elif view_mode == "Group by Auditorium":
-                for audi in sorted(list(set(s['Auditorium'] for s in filtered)), key=lambda x: int(x) if x.isdigit() else 999):
-                    with st.expander(f"🖼️ Auditorium {audi}", expanded=True):
-                        for s in sorted([s for s in filtered if s['Auditorium'] == audi], key=lambda x: x['Showtime']):
-                            col_t, col_info = st.columns([1, 5])
-                            is_past = (q_date == current_local_time.date() and s['Showtime'] < current_local_time)
-                            t_str = f"~~{s['Showtime'].strftime('%I:%M %p')}~~" if is_past else f"**{s['Showtime'].strftime('%I:%M %p')}**"
-                            d_str = f"~~{s['Title']} ({s['ScreenType']}) — {s['Duration']}m~~" if is_past else f"**{s['Title']}** ({s['ScreenType']}) — {s['Duration']}m"
-                            col_t.markdown(t_str)
-                            col_info.markdown(d_str)
-            else: # Group by Movie
-                for title in list(dict.fromkeys([s['Title'] for s in filtered])):
-                    m_shows = [s for s in filtered if s['Title'] == title]
-                    
-                    other_t = sorted([cluster_theaters.get(tc, f"Theater {tc}") 
-                                    for tc in set(s['TheaterCode'] for s in all_flat_data if s['Title'] == title) 
-                                    if tc != t_item['theatre_code']])
-                    
-                    scheduled_days = sorted([datetime.strptime(d_str, "%m-%d-%Y").strftime("%b %d") for d_str, d_data in st.session_state.multi_day_raw.items() 
-                                       if any(m.get('Title') == title for m in d_data.get('movies', []))])
-                    
-                    meta = movie_meta.get(m_shows[0]['master_code'], {})
-                    new_tag = "🔴 NEW" if meta.get('is_new') else ""
-
-                    with st.expander(f"🍿 {title} ({m_shows[0]['Rating']}) — {m_shows[0]['Duration']} min {new_tag}", expanded=True):
-                        for mt in sorted(list(set(s['ScreenType'] for s in m_shows))):
-                            ts = [s for s in m_shows if s['ScreenType'] == mt]
-                            t_common = set.intersection(*(s['raw_attrs'] for s in ts)) if ts else set()
-                            common_attribs = sorted(t_common - {mt})
-                            st.markdown(f'<div style="margin-bottom: 6px;"><span style="background-color: rgba(151, 166, 195, 0.15); padding: 4px 12px; border-radius: 4px; border-left: 4px solid #ff4b4b;"><span style="font-weight: bold;">{mt}</span> <span style="color: grey; font-size: 0.85em; font-weight: normal; margin-left: 10px;">({", ".join(sorted(common_attribs)) if common_attribs else ""})</span></span></div>', unsafe_allow_html=True)
-
-                            row = []
-                            for s in ts:
-                                is_past = (q_date == current_local_time.date() and s['Showtime'] < current_local_time)
-                                delta_attribs = get_attr_diff(s['Attributes'], t_common)
-                                t_str = s['Showtime'].strftime('%I:%M %p')
-                                if is_past:
-                                    final_time = f"<del>{t_str}</del>" 
-                                    meta_text = f"  <small style='color:grey'><del>(Audi {s['Auditorium']}) {delta_attribs}</del></small>"
-                                else:
-                                    final_time = f"{t_str}" 
-                                    meta_text = f"  <small style='color:grey'>(Audi {s['Auditorium']}) {delta_attribs}</small>"
-                                row.append(f"{final_time}{meta_text}")
-                            
-                            st.markdown(f"&nbsp;&nbsp;&nbsp;&nbsp;{' | '.join(row)}", unsafe_allow_html=True)
-
-                        footer_col, link_col = st.columns([4, 1])
-                        with footer_col:
-                            if scheduled_days:
-                                st.markdown(f"<div style='font-size: 0.8rem; color: #e67e22; padding-top: 2px;'>🗓️ <b>Scheduled Dates:</b> {', '.join(scheduled_days)}</div>", unsafe_allow_html=True)
-                            if other_t:
-                                st.markdown(f"<div style='font-size: 0.8rem; color: #666; padding-top: 5px;'><b>Also Playing at:</b> {', '.join(other_t)}</div>", unsafe_allow_html=True)
-
-                        with link_col:
-                            if other_t or scheduled_days:
-                                if st.button("📅 Full Schedule", key=f"link_{title}_{t_item['theatre_code']}", use_container_width=True):
-                                    st.session_state.nav_redirect = "🎬 Movie Explorer"
-                                    st.session_state.selected_movie = title
-                                    st.rerun()
-
-        with tab_nearby:
-            primary_titles_week = set()
-            all_titles_week = set()
-            
-            for d_str, d_data in st.session_state.multi_day_raw.items():
-                for theater_show in d_data.get('shows', []):
-                    t_code = theater_show.get('TheatreCode')
-                    titles = [m.get('Title') for m in theater_show.get('Film', [])]
-                    if t_code == t_item['theatre_code']:
-                        primary_titles_week.update(titles)
-                    all_titles_week.update(titles)
-            
-            nearby_only_titles = sorted(list(all_titles_week - primary_titles_week))
+            with tab_now:
+                now_playing_panel(view)
 
-            if nearby_only_titles:
-                st.subheader("🚗 Exclusive Nearby This Week")
-                st.caption(f"These movies are NOT playing at {t_item['name']} any time this week.")
-                
-                nearby_cols = st.columns(3)
-                for idx, title in enumerate(nearby_only_titles):
-                    theater_dates = {}
-                    master_code = None
-                    
-                    for d_str, d_data in st.session_state.multi_day_raw.items():
-                        for theater_show in d_data.get('shows', []):
-                            t_code = theater_show.get('TheatreCode')
-                            for movie in theater_show.get('Film', []):
-                                if movie.get('Title') == title:
-                                    if not master_code: master_code = movie.get('MasterMovieCode')
-                                    t_name = cluster_theaters.get(t_code, f"Theater {t_code}")
-                                    date_label = datetime.strptime(d_str, "%m-%d-%Y").strftime("%b %d")
-                                    if t_name not in theater_dates:
-                                        theater_dates[t_name] = []
-                                    if date_label not in theater_dates[t_name]:
-                                        theater_dates[t_name].append(date_label)
-                    
-                    meta = st.session_state.global_movie_catalog.get(master_code, {'rating': 'NR', 'duration': 0, 'is_new':False})
-                    
-                    new_tag = "<small style='font-size: 0.8rem; color:red;'>🔴 NEW</small>" if meta.get('is_new') else ""
+            with tab_nearby:
+                week_index = get_week_index()
+                nearby_only_titles = sorted(title for title, by_theater in week_index.titles.items()
+                                            if t_item['theatre_code'] not in by_theater)
 
-                    with nearby_cols[idx % 3]:
-                        with st.container(border=True):
-                            st.markdown(f"**{title}** ({meta['rating']}) {new_tag}", unsafe_allow_html=True)
-                            
-                            for t_name, dates in theater_dates.items():
-                                date_str = ", ".join(sorted(dates))
-                                st.markdown(f"<p style='font-size: 0.8rem; margin-bottom: 2px;'>📍 <b>{t_name}</b></p>", unsafe_allow_html=True)
-                                st.markdown(f"<p style='font-size: 0.8rem; color: #e67e22; margin-top: -5px;'>🗓️ {date_str}</p>", unsafe_allow_html=True)
-                            
-                            st.caption(f"⏱️ {meta['duration']} min")
-            else:
-                st.info("No exclusive nearby movies found for the upcoming 7 days.")
-
-        with tab_upcoming:
-            current_t_code = t_item['theatre_code']
-
-            if current_t_code not in st.session_state.theater_future_cache:
-                with st.spinner(f"Loading upcoming schedule for {t_item['name']}..."):
-                    api_url = f"https://www.regmovies.com/api/getShowtimes?theatres={current_t_code}&date={f_date}"
-                    future_data = fetch_data(api_url, t_item['path_name'], None)
-                    if future_data:
-                        _, _, _, new_future_map = flatten_data(future_data)
-                        st.session_state.theater_future_cache.update(new_future_map)
-
-            scoped_future_movies = st.session_state.theater_future_cache.get(current_t_code, [])
-
-            if scoped_future_movies:
-                st.subheader("📅 Upcoming Movies")
-                st.caption(f"These movies are scheduled to show at {t_item['name']}.")
-                cols = st.columns(3)
-                for i, f_movie in enumerate(scoped_future_movies):
-                    with cols[i % 3]:
-                        with st.container(border=True):
-                            st.markdown(f"**{f_movie['title']}** ({f_movie['rating']})")
-                            dates_str = ", ".join(f_movie['scheduled_dates'])
-                            st.markdown(f"<small style='color:#e67e22;'>Scheduled: {dates_str}</small>", unsafe_allow_html=True)
-                            st.caption(f"⏱️ {f_movie['duration']} min")
-            else:
-                st.info("No upcoming movies listed for this theater.")
-                            
-    elif nav_tab == "🎬 Movie Explorer":
-        st.subheader("🎬 Movie Explorer")
-        st.info(f"Movies: **{t_item['name']}** and nearby theaters on **{q_date.strftime('%A, %b %d')}**")
-
-        
-        master_name_map = {t['item']['theatre_code']: t['item']['name'] for t in theaters}
-        theater_info = {t_item['theatre_code']: {"name": t_item['name'], "dist": 0, "time": 0}}
-        if 'nearby_theaters' in t_item:
-            for nt in t_item['nearby_theaters']:
-                n_code = nt['code']
-                theater_info[n_code] = {
-                    "name": master_name_map.get(n_code, f"Theater {n_code}"), 
-                    "dist": nt.get('road_miles', 0), 
-                    "time": nt.get('drive_min', 0)
-                }
-        
-        movie_list_data = []
-        titles_processed = set()
-        for s in all_flat_data:
-            if s['Title'] not in titles_processed:
-                rating = movie_meta.get(s['master_code'], {}).get('rating', 'NR')
-                movie_list_data.append({"title": s['Title'], "label": f"{s['Title']} ({rating})"})
-                titles_processed.add(s['Title'])
-        movie_list_data.sort(key=lambda x: x['title'])
-
-        st.markdown("###### 🍿 Select a Movie")
-        st.markdown("""
-            <style>
-            div.stButton > button {
-                width: 100% !important;
-                height: 40px !important;
-                border-radius: 6px !important;
-                background-color: rgba(151, 166, 195, 0.1) !important;
-                border: 1px solid rgba(151, 166, 195, 0.2) !important;
-                transition: all 0.2s ease-in-out !important;
-            }
-            div.stButton > button:hover {
-                background-color: rgba(151, 166, 195, 0.2) !important;
-                border-color: #ff4b4b !important;
-            }
-            div.stButton > button div p {
-                white-space: nowrap !important;
-                overflow: hidden !important;
-                text-overflow: ellipsis !important;
-                font-size: 0.75rem !important;
-                font-weight: 600 !important;
-                color: var(--text-color) !important;
-            }
-            </style>
-        """, unsafe_allow_html=True)
-
-        if "selected_movie" not in st.session_state:
-            st.session_state.selected_movie = movie_list_data[0]['title'] if movie_list_data else None
-
-        with st.container(height=130, border=True):
-            cols_per_row = 5
-            for i in range(0, len(movie_list_data), cols_per_row):
-                row_cols = st.columns(cols_per_row)
-                for j, m_entry in enumerate(movie_list_data[i : i + cols_per_row]):
-                    title = m_entry['title']
-                    is_selected = (title == st.session_state.selected_movie)
-                    label = f"✅ {m_entry['label']}" if is_selected else m_entry['label']
-                    if row_cols[j].button(label, key=f"grid_{title}", use_container_width=True):
-                        st.session_state.selected_movie = title
-                        st.rerun()
-
-        sel_movie = st.session_state.selected_movie
-        if sel_movie:
-            m_data = [s for s in all_flat_data if s['Title'] == sel_movie]
-            meta = movie_meta.get(m_data[0]['master_code'], {})
-            new_tag = " | 🔴 NEW RELEASE" if meta.get('is_new') else ""
-            st.markdown(f"## {sel_movie}", unsafe_allow_html=True)
-            st.markdown(f"#### <small style='color:grey'>({meta.get('rating', 'NR')} | {meta.get('duration', 0)} min {new_tag})</small>", unsafe_allow_html=True)
-            
-            with st.expander("🔍 Advanced Filters", expanded=False):
-                f_col1, f_col2, f_col3 = st.columns(3)
-                with f_col1:
-                    m_formats = sorted(list(set(s['ScreenType'] for s in m_data)))
-                    f_fmt = st.multiselect("Format", options=m_formats, placeholder="All")
-                with f_col2:
-                    t_ranges = {"8AM-12N": (8, 12), "12N-4PM": (12, 16), "4PM-8PM": (16, 20), "8PM-12M": (20, 24)}
-                    f_win = st.multiselect("Time Window", options=list(t_ranges.keys()))
-                with f_col3:
-                    all_m_attrs = set(a for s in m_data for a in s['raw_attrs'])
-                    f_extra = st.multiselect("Attributes", options=sorted(list(all_m_attrs - set(m_formats))))
-                    f_hide = st.checkbox("Hide Past Shows", value=True)
-
-            filtered_m = [s for s in m_data if 
-                      (not f_fmt or s['ScreenType'] in f_fmt) and
-                      (not f_win or any(t_ranges[w][0] <= s['Showtime'].hour < t_ranges[w][1] for w in f_win)) and
-                      (not f_extra or set(f_extra).issubset(s['raw_attrs'])) and
-                      (not f_hide or (s['Showtime'] > current_local_time if q_date == current_local_time.date() else True))]
-
-            fmts_to_show = sorted(list(set(s['ScreenType'] for s in filtered_m)))
-            
-            for fmt in fmts_to_show:
-                fmt_shows = [s for s in filtered_m if s['ScreenType'] == fmt]
+                if nearby_only_titles:
+                    st.subheader("🚗 Exclusive Nearby This Week")
+                    st.caption(f"These movies are NOT playing at {t_item['name']} any time this week.")
                 
-                with st.expander(f"✨ {fmt}", expanded=True):
-                    t_codes = sorted(list(set(s['TheaterCode'] for s in fmt_shows)), 
-                                    key=lambda x: theater_info.get(x, {}).get('time', 999))
+                    nearby_cols = st.columns(3)
+                    for idx, title in enumerate(nearby_only_titles):
+                        theater_dates = {cluster_theaters.get(t_code, f"Theater {t_code}"): week_index.playing_dates(title, t_code)
+                                         for t_code in week_index.theaters(title)}
+                        master_code = week_index.master_codes.get(title)
                     
-                    for tc in t_codes:
-                        t_shows = sorted([s for s in fmt_shows if s['TheaterCode'] == tc], key=lambda x: x['Showtime'])
-                        info = theater_info.get(tc, {"name": f"Theater {tc}", "dist": 0, "time": 0})
-                        
-                        is_primary = (tc == t_item['theatre_code'])
-                        t_icon = "📍" if is_primary else "🚗"
-                        dist_txt = "(Current)" if is_primary else f"({info['time']}m / {info['dist']}mi)"
-                        
-                        st.markdown(f"**{t_icon} {info['name']}** <small style='color:grey'>{dist_txt}</small>", unsafe_allow_html=True)
-                        
-                        playing_on_dates = []
-                        for d_str, d_data in st.session_state.multi_day_raw.items():
-                            for theater_show in d_data.get('shows', []):
-                                if theater_show.get('TheatreCode') == tc:
-                                    for movie in theater_show.get('Film', []):
-                                        if movie.get('Title') == sel_movie:
-                                            day_fmts = set(p.get('PerformanceGroup') or "2D" for p in movie.get('Performances', []))
-                                            if fmt in day_fmts:
-                                                playing_on_dates.append(datetime.strptime(d_str, "%m-%d-%Y").strftime("%b %d"))
-                        
-                        t_common = set.intersection(*(s['raw_attrs'] for s in t_shows)) if t_shows else set()
-                        common_attribs = sorted(t_common - {fmt})
-                        st.markdown(f"<p style='color:grey; font-size:0.8rem; margin-top:-10px; margin-bottom:5px;'>({', '.join(common_attribs) if common_attribs else ""})</p>", unsafe_allow_html=True)
-
-                        row_items = []
-                        for s in t_shows:
-                            t_str = s['Showtime'].strftime('%I:%M %p')
-                            delta_attribs = get_attr_diff(s['Attributes'], t_common)
-                            
-                            is_past = (q_date == current_local_time.date() and s['Showtime'] < current_local_time)
-                            if is_past:
-                                final_time = f"<del>{t_str}</del>" 
-                                meta_text = f" <small style='color:grey'><del>(Audi {s['Auditorium']}) {delta_attribs}</del></small>"
-                            else:    
-                                final_time = f"**{t_str}**"
-                                meta_text = f" <small style='color:grey'>(Audi {s['Auditorium']}) {delta_attribs}</small>"
-
-                            row_items.append(f"{final_time}{meta_text}")
-                        
-                        st.markdown(f"&nbsp;&nbsp;&nbsp;&nbsp;{' | '.join(row_items)}", unsafe_allow_html=True)
-
-                        if playing_on_dates:
-                            date_str = ", ".join(sorted(list(set(playing_on_dates))))
-                            st.markdown(f"<p style='font-size: 0.8rem; color: #e67e22; margin-top: -5px;'>🗓️ <b>Scheduled Dates:</b> {date_str}</p>", unsafe_allow_html=True)
-
-                        st.divider()
-                        
-    elif nav_tab == "🗓️ Smart Scheduler":
-        st.subheader("🗓️ Smart Scheduler")
-        st.info(f"Scheduling: **{t_item['name']}** and nearby theaters on **{q_date.strftime('%A, %b %d')}**")
-
-        primary_code = t_item['theatre_code']
-
-        with st.expander("⚙️ Parameters", expanded=True):
-            cached_dates = sorted(list(st.session_state.multi_day_raw.keys()))
-            t_opts = list(cluster_theaters.keys())
-            r1_c1, r1_c2 = st.columns(2)
-            
-            with r1_c1:
-                target_theaters = st.multiselect(
-                    "1\\. Select Theaters (Ordered by Preference)", 
-                    options=t_opts,
-                    default=[t_item['theatre_code']],
-                    format_func=lambda x: cluster_theaters.get(x),
-                    key=f"target_theaters_{t_item['theatre_code']}"
-                )
-
-                target_days = st.multiselect(
-                    "2\\. Select Dates", 
-                    options=cached_dates,
-                    format_func=lambda x: datetime.strptime(x, "%m-%d-%Y").strftime("%b %d"),
-                    default=[f_date])
-            
-            with r1_c2:
-                global_reactive_titles = set()
-                for d_str in target_days:
-                    day_data = st.session_state.multi_day_raw.get(d_str)
-                    if day_data:
-                        for theater_show in day_data.get('shows', []):
-                            if theater_show.get('TheatreCode') in target_theaters:
-                                for movie in theater_show.get('Film', []):
-                                    global_reactive_titles.add(movie.get('Title'))
-                
-                def format_movie_label(title):
-                    m_code = next((code for code, meta in st.session_state.global_movie_catalog.items() 
-                                  if meta.get('title') == title), None)
-                    is_new = st.session_state.global_movie_catalog.get(m_code, {}).get('is_new', False)
-                    return f"{title} (🔴 NEW)" if is_new else title
-                
-                reactive_movies = sorted([t for t in global_reactive_titles if t])
-                
-                target_movies = st.multiselect(
-                    "3\\. Select Movies (Ordered by Preference)", 
-                    options=reactive_movies,
-                    format_func=format_movie_label,
-                    key=f"target_movies_{t_item['theatre_code']}"
-                )
-
-                n_movies = len(target_movies)
-
-
-                available_formats = sorted(list(set(
-                    s['ScreenType'] for s in all_flat_data 
-                    if s['Title'] in target_movies and s['TheaterCode'] in target_theaters
-                ))) if target_movies else sorted(list(set(
-                    s['ScreenType'] for s in all_flat_data 
-                    if s['TheaterCode'] in target_theaters
-                )))
-                
-                target_formats = st.multiselect(
-                    "4\\. Preferred Formats", 
-                    options=available_formats, 
-                    placeholder="All",
-                    key=f"target_formats_{t_item['theatre_code']}"
-                )
-            
-            time_opts = ["Any Time"] + get_time_options()
-            c1, c2, c3 = st.columns(3)
-            with c1: 
-                sel_start = st.selectbox("Earliest Start", options=time_opts, index=0)
-                sel_end = st.selectbox("Latest End", options=time_opts, index=0)
-                t_start = dt_time(0, 0) if sel_start == "Any Time" else datetime.strptime(sel_start, "%H:%M").time()
-                t_end = dt_time(23, 59) if sel_end == "Any Time" else datetime.strptime(sel_end, "%H:%M").time()
-
-                break_opts = [None] + list(range(1, n_movies)) if n_movies > 1 else [None]
-                b_after = st.selectbox("Long break after movie #", options=break_opts, help="Set a longer break than after a specific movie.")
-            with c2: 
-                buff = st.slider("Buffer (min)", 0, 60, 15, help="Set the minimum gap between two movies")
-                g_cap = st.slider("Max Gap (min)", 30, 240, 120, help="Set the maximum gap between two movies")
-                b_val = st.slider("Break duration (min)", 30, 120, 60)
-            with c3: 
-                unlimited = st.checkbox("Regal Unlimited Rule (90-min gap)", value=True, help="Apply a minimum gap of 90-min between showtimes.")
-                fudge = st.checkbox("Fudge Factor (5-min overlap)", help="Allow a 5 min overlap between showtimes if no better schedule possible.")
-                max_option = n_movies if n_movies > 1 else 1
-                if len(target_days) > 1:
-                    max_per_day = st.number_input("Max Movies per Day", min_value=1, max_value=max_option, value=max_option)
-                    strategy = st.selectbox(
-                        "Optimization Strategy", 
-                        options=["Minimize Days", "Maximize Compactness"],
-                        help = "Minimize Days will pack your selected movies into the fewest number of trips possible. Maximize Compactness prioritizes the most efficient schedules with the shortest gaps and minimal travel, even if spread across more days.") 
-
-        # --- Anchor Show Selection ---
-        with st.container(border=True):
-            enable_anchor = st.checkbox("📍 Include a Booked (Anchor) Show", value=False)
-            anchor_show = None
-
-            if enable_anchor:
-                st.info("Lock a booked showtime into your plan. The scheduler will build your itinerary around this fixed point, which may limit other options.")
-                a_col1, a_col2, a_col3, a_col4  = st.columns(4)
-                with a_col1:
-                    # Filter based on target_theaters
-                    a_theater = st.selectbox("Anchor Theater", 
-                                             options=target_theaters, 
-                                             format_func=lambda x: cluster_theaters.get(x))
-                with a_col2:
-                    # Filter based on target_days
-                    a_day = st.selectbox("Anchor Day", 
-                                         options=target_days,
-                                         format_func=lambda x: datetime.strptime(x, "%m-%d-%Y").strftime("%b %d"))
-                with a_col3:
-                    # Pull movies available for that theater and day
-                    a_day_data = st.session_state.multi_day_raw.get(a_day)
-                    valid_anchor_titles = []
-                    if a_day_data:
-                        for ts in a_day_data.get('shows', []):
-                            if ts.get('TheatreCode') == a_theater:
-                                # Intersection of target_movies and what is playing at this specific theater
-                                theater_titles = [m.get('Title') for m in ts.get('Film', [])]
-                                valid_anchor_titles = [t for t in target_movies if t in theater_titles]
-                    a_movie = st.selectbox("Anchor Movie", options=sorted(valid_anchor_titles))
-                # Final step: Select the exact showtime
-                with a_col4:
-                    a_showtimes = []
-                    if a_day_data and a_movie:
-                        day_flat_anchor, _, _, _ = flatten_data(a_day_data)
-                        a_showtimes = [s for s in day_flat_anchor if s['Title'] == a_movie and s['TheaterCode'] == a_theater]
+                        meta = st.session_state.global_movie_catalog.get(master_code, {'rating': 'NR', 'duration': 0, 'is_new':False})
                     
-                    selected_anchor = st.selectbox("Anchor Showtime", 
-                                               options=a_showtimes, 
-                                               format_func=lambda x: f"{x['Showtime'].strftime('%I:%M %p')} ({x['ScreenType']})")
-                    anchor_show = selected_anchor
-                
-        if st.button("🚀 Generate Itineraries"):
-            if len(target_movies) < 2:
-                st.error("Please select at least 2 movies.")
-            else:
-                params = {
-                    'start': t_start, 'end': t_end, 'buffer': buff, 'gap_cap': g_cap, 
-                    'unlimited': unlimited, 'fudge': fudge, 'break_after': b_after, 
-                    'long_buffer': b_val, 'formats': target_formats, 'theaters': target_theaters,
-                    'primary_code': t_item['theatre_code'],
-                    'strategy': strategy if len(target_days) > 1 else "Minimize Days",
-                    'max_per_day': max_per_day if len(target_days) > 1 else n_movies
-                }
-                
-                if len(target_days) > 1:
-                    multi_itinerary = find_multi_day_itineraries(target_movies, target_days, params, drive_map,anchor_show)
-            
-                    if not multi_itinerary:
-                        st.error("Could not find a valid multi-day schedule for these movies. Consider expanding selections and broadening filters.")
-                    else:
-                        st.success(f"🗓️ Multi-Day Plan Generated: {len(multi_itinerary)} days used.")
-                        
-                        total_movies = sum(len(p) for p in multi_itinerary.values())
-                        total_hops = sum(calculate_path_score(p, params['primary_code'], drive_map)['hops'] for p in multi_itinerary.values())
-                        sorted_plan_days = sorted(multi_itinerary.keys(), key=lambda x: datetime.strptime(x, '%m-%d-%Y'))
-                        scheduled_titles = [s['Title'] for p in multi_itinerary.values() for s in p]
-                        unscheduled = [m for m in target_movies if m not in scheduled_titles]
-
-                        st.markdown(f"### 🏆 Schedule Summary")
-                        c1, c2, c3 = st.columns(3)
-                        c1.metric("Total Movies", f"{total_movies} / {len(target_movies)}")
-                        c2.metric("Total Days", len(multi_itinerary))
-                        c3.metric("Total Hops", total_hops)
-
-                        timeline_html = "<div style='display: flex; gap: 5px; margin-bottom: 20px;'>"
-                        for d_str in sorted_plan_days:
-                            color = "#2ecc71" if d_str in multi_itinerary else "#ecf0f1"
-                            label = datetime.strptime(d_str, '%m-%d-%Y').strftime('%A, %b %d')
-                            count = len(multi_itinerary[d_str]) if d_str in multi_itinerary else 0
-                            timeline_html += f"""
-                            <div style='background-color: {color}; padding: 10px; border-radius: 5px; text-align: center; flex: 1; border: 1px solid #bdc3c7; min-width: 80px;'>
-                                <div style='font-size: 0.7rem; color: #7f8c8d;'>{label}</div>
-                                <div style='font-weight: bold;'>{count} 🎬</div>
-                            </div>"""
-                        timeline_html += "</div>"
-                        st.markdown(timeline_html, unsafe_allow_html=True)
-                        
-                        st.download_button("📅 Download ICS for Full Schedule", 
-                                                generate_batch_ics(multi_itinerary, cluster_theaters), 
-                                                file_name=f"movies_multi_full.ics", 
-                                                mime="text/calendar", 
-                                                key=f"dl_multi_full")
-
-                        if not unscheduled:
-                            st.success("✅ **Perfect Match!** All selected movies fit the schedule.")
-                        else:
-                            st.warning(f"⚠️ **Incomplete Schedule:** {len(unscheduled)} movies could not be fitted.")
+                        new_tag = "<small style='font-size: 0.8rem; color:red;'>🔴 NEW</small>" if meta.get('is_new') else ""
 
-                        for d_str in sorted_plan_days:
-                            path = multi_itinerary[d_str]
-                            d_display = datetime.strptime(d_str, '%m-%d-%Y').strftime('%A, %b %d')
-                            stats = calculate_path_score(path, params['primary_code'], drive_map)
+                        with nearby_cols[idx % 3]:
+                            with st.container(border=True):
+                                st.markdown(f"**{title}** ({meta['rating']}) {new_tag}", unsafe_allow_html=True)
+                            
+                                for t_name, dates in theater_dates.items():
+                                    date_str = ", ".join(dates)
+                                    st.markdown(f"<p style='font-size: 0.8rem; margin-bottom: 2px;'>📍 <b>{t_name}</b></p>", unsafe_allow_html=True)
+                                    st.markdown(f"<p style='font-size: 0.8rem; color: #e67e22; margin-top: -5px;'>🗓️ {date_str}</p>", unsafe_allow_html=True)
                             
+                                st.caption(f"⏱️ {meta['duration']} min")
+                else:
+                    st.info("No exclusive nearby movies found for the upcoming 7 days.")
+
+            with tab_upcoming:
+                current_t_code = t_item['theatre_code']
+
+                if current_t_code not in st.session_state.theater_future_cache:
+                    with st.spinner(f"Loading upcoming schedule for {t_item['name']}..."):
+                        api_url = f"https://www.regmovies.com/api/getShowtimes?theatres={current_t_code}&date={f_date}"
+                        future_data = fetch_data(api_url, t_item['path_name'], None)
+                        if future_data:
+                            _, _, _, new_future_map = flatten_data(future_data)
+                            st.session_state.theater_future_cache.update(new_future_map)
+
+                scoped_future_movies = st.session_state.theater_future_cache.get(current_t_code, [])
+
+                if scoped_future_movies:
+                    st.subheader("📅 Upcoming Movies")
+                    st.caption(f"These movies are scheduled to show at {t_item['name']}.")
+                    cols = st.columns(3)
+                    for i, f_movie in enumerate(scoped_future_movies):
+                        with cols[i % 3]:
                             with st.container(border=True):
-                                st.markdown(f"#### 📅 {d_display}")
-                                st.markdown(f"🎬 **{len(path)} Movies** | 🚗 {stats['hops']} Hops | ⏱️ {stats['gap']}m Total Gap")
-                                
-                                for idx, s in enumerate(path):
-                                    t_name = cluster_theaters.get(s['TheaterCode'], "Unknown")
-                                    start_t = s['Showtime'].strftime('%I:%M %p')
-                                    end_t = (s['Showtime'] + timedelta(minutes=s['Duration'])).strftime('%I:%M %p')
-                                    
-                                    st.write(f"🕒 **{start_t} - {end_t}**: {s['Title']} (**{s['ScreenType']}**) @{t_name}")
-                                    
-                                    if idx < len(path) - 1:
-                                        next_s = path[idx + 1]
-                                        gap = int((next_s['Showtime'] - (s['Showtime'] + timedelta(minutes=s['Duration']))).total_seconds() / 60)
-                                        drive_info = ""
-                                        if s['TheaterCode'] != next_s['TheaterCode']:
-                                            nb_code = next_s['TheaterCode'] if next_s['TheaterCode'] != params['primary_code'] else s['TheaterCode']
-                                            d_stats = drive_map.get(nb_code, {'time': 20, 'dist': 0})
-                                            drive_info = f". Drive: {d_stats['time']} mins ({d_stats['dist']} mi)"
-                                        st.markdown(f"&nbsp;&nbsp;&nbsp;&nbsp;<small style='color:grey'>Gap: {gap} mins{drive_info}</small>", unsafe_allow_html=True)
-                                
-                                st.download_button("📅 Download ICS for Day", 
-                                                generate_ics(path, cluster_theaters[params['primary_code']]), 
-                                                file_name=f"movies_{d_str}.ics", 
-                                                mime="text/calendar", 
-                                                key=f"dl_multi_{d_str}")
-
-                        if unscheduled:
-                            with st.expander("⚠️ Unscheduled Movies"):
-                                for m in unscheduled:
-                                    st.write(f"❌ **{m}**: Could not fit into the selected time windows or theater constraints.")
-                
+                                st.markdown(f"**{f_movie['title']}** ({f_movie['rating']})")
+                                dates_str = ", ".join(f_movie['scheduled_dates'])
+                                st.markdown(f"<small style='color:#e67e22;'>Scheduled: {dates_str}</small>", unsafe_allow_html=True)
+                                st.caption(f"⏱️ {f_movie['duration']} min")
                 else:
-                    sched_date_str = target_days[0]
-                    sched_date_obj = datetime.strptime(sched_date_str, '%m-%d-%Y').date()
-                    day_data_raw = st.session_state.multi_day_raw.get(sched_date_str)
-                    if day_data_raw:
-                        day_flat_sched, _, _, _ = flatten_data(day_data_raw)
-
-                        if enable_anchor and anchor_show:
-                            paths = run_anchored_search(anchor_show, target_movies, sched_date_str, params, drive_map)
-                        else:
-                            paths = find_itineraries([], target_movies, day_flat_sched, params, sched_date_obj, drive_map)
-                    else:
-                        paths = []
-                
-                    if not paths: 
-                        st.error("No valid schedules found. Consider expanding selections and broadening filters.")
-                    else:
-                        processed_paths = []
-                        for p_raw in paths:
-                            stats = calculate_path_score(p_raw, primary_code, drive_map)
+                    st.info("No upcoming movies listed for this theater.")
                             
-                            p_id = "-".join([f"{s['master_code']}{s['Showtime'].timestamp()}" for s in p_raw])
-                            processed_paths.append({
-                                'path': p_raw, 
-                                'count': stats['count'], 
-                                'hops': stats['hops'], 
-                                'miles': stats['miles'], 
-                                'score': stats['score'], 
-                                'total_gap': stats['gap'], 
-                                'id': p_id
-                            })
-
-                        ranked_pool = sorted(processed_paths, key=lambda x: (-x['score'], x['total_gap']))
-
-                        final_selections = []
-                        seen_ids = set()
-
-                        def add_selection(entry, label):
-                            if entry and entry['id'] not in seen_ids:
-                                final_selections.append((entry, label))
-                                seen_ids.add(entry['id'])
-                                return True
-                            return False
-
-                        # 1. Smart Marathon (Best overall Score)
-                        add_selection(ranked_pool[0], "Smart Marathon (Best Efficiency)")
-
-                        # 2. Absolute Marathon (Max Movies - strictly by count)
-                        abs_mar = sorted(processed_paths, key=lambda x: (-x['count'], -x['score']))[0]
-                        add_selection(abs_mar, "Absolute Marathon (Max Movies)")
-
-                        # 3. Single-Theater Max (Filtered by 0 Hops)
-                        st_p = sorted([pp for pp in processed_paths if pp['hops'] == 0], key=lambda x: (-x['score']))
-                        if st_p: add_selection(st_p[0], "Single-Theater Max (Zero Hops)")
-
-                        # 4. Priority Movie Match (Matches the first two selected movies)
-                        if len(target_movies) >= 2:
-                            top_two = set(target_movies[:2])
-                            p_mov = sorted([pp for pp in processed_paths if top_two.issubset(set(s['Title'] for s in pp['path']))], key=lambda x: (-x['score']))
-                            if p_mov: add_selection(p_mov[0], "Priority Movie Match (#1 & #2)")
-
-                        # 5. Fill remaining slots with the next best optimized paths
-                        for entry in ranked_pool:
-                            if len(final_selections) >= 5: break
-                            add_selection(entry, "Alternative Optimized Path")
-
-                        for i, (entry, label) in enumerate(final_selections[:5]):
-                            path, count, hops, miles = entry['path'], entry['count'], entry['hops'], entry['miles']
-                            with st.container(border=True):
-                                st.markdown(f"#### Option {i+1}: {count} Movies")
-                                st.markdown(f"🏆 **{label}** | 🚗 {hops} Hops ({round(miles, 1)} mi travel)", unsafe_allow_html=True)
-                                
-                                for idx, s in enumerate(path):
-                                    t_name = cluster_theaters.get(s['TheaterCode'], "Unknown")
-                                    start_t, end_t = s['Showtime'], s['Showtime'] + timedelta(minutes=s['Duration'])
-                                    st.write(f"🕒 **{start_t.strftime('%I:%M %p')} - {end_t.strftime('%I:%M %p')}**: {s['Title']} (**{s['ScreenType']}**) @{t_name}")
-                                    
-                                    if idx < len(path) - 1:
-                                        next_s = path[idx + 1]
-                                        gap = int((next_s['Showtime'] - end_t).total_seconds() / 60)
-                                        drive_info = ""
-                                        if s['TheaterCode'] != next_s['TheaterCode']:
-                                            nb_code = next_s['TheaterCode'] if next_s['TheaterCode'] != primary_code else s['TheaterCode']
-                                            d_stats = drive_map.get(nb_code, {'time': 20, 'dist': 0})
-                                            drive_info = f". Drive: {d_stats['time']} mins ({d_stats['dist']} mi)"
-                                        st.markdown(f"&nbsp;&nbsp;&nbsp;&nbsp;<small style='color:grey'>Gap: {gap} mins{drive_info}</small>", unsafe_allow_html=True)
-                                
-                                st.divider()
-                                st.download_button("📅 Download ICS", 
-                                                generate_ics(path, t_item['name']), 
-                                                file_name=f"movies_{q_date}.ics", 
-                                                mime="text/calendar", 
-                                                key=f"dl_{i}_{entry['id']}")
-                                
-                                if count < len(target_movies):
-                                    missing = [t for t in target_movies if t not in [s['Title'] for s in path]]
-                                    with st.expander("⚠️ Why were some movies left out?"):
-                                        report = get_conflict_report(path, missing, all_flat_data, params, anchor_show, drive_map)
-                                        for line in report: st.write(line)
-else: st.info("Search for a theater in the sidebar to begin.")
\ No newline at end of file
+        elif nav_tab == "🎬 Movie Explorer":
+            movie_explorer_panel(view)
+
+        elif nav_tab == "🗓️ Smart Scheduler":
+            scheduler_panel(view)
+    else: st.info("Search for a theater in the sidebar to begin.")
+
+    # Finish the rest of the week's sync once the selected day is on screen
+    if selected_theater and st.session_state.get("sync_jobs"):
+        # Rerun only when a day landed, so a day the remote keeps refusing cannot loop the script
+        if drain_day_sync(target_codes, t_item, cluster_theaters, status_context, sync_msg or st.toast("🔍 Finishing 7-Day Sync...")):
+            st.rerun()
@@ -0,0 +1,79 @@
+import random
+import sys
+from datetime import date, datetime, time as dt_time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import regal_engine as engine
+
+
+class GridDrive:
+    # drive(from, to) -> (minutes, miles) between theaters laid out on a line, 6 miles apart
+    def __init__(self, codes):
+        self.position = {code: i for i, code in enumerate(codes)}
+
+    def drive(self, from_code, to_code):
+        miles = abs(self.position[from_code] - self.position[to_code]) * 6
+        return (round(miles * 1.5) + 5 if miles else 0, miles)
+
+
+SHOW_DAY = date(2026, 10, 20)
+THEATERS = ["T1", "T2", "T3"]
+
+
+def make_day(seed, n_titles=6):
+    rng = random.Random(seed)
+    intern = engine.STRINGS.intern
+    shows = []
+    for n in range(n_titles):
+        title = f"Film {n}"
+        duration = rng.choice([85, 100, 120, 140])
+        for code in rng.sample(THEATERS, rng.randint(1, len(THEATERS))):
+            for _ in range(rng.randint(1, 4)):
+                start = datetime.combine(SHOW_DAY, dt_time(rng.randint(9, 21), rng.choice([0, 15, 30, 45])))
+                shows.append(engine.Screening(engine.to_minutes(start), duration, intern(code), intern(title), intern("PG-13"),
+                                          intern("2D"), intern(str(rng.randint(1, 12))), intern(f"HO{n}"), 0))
+    return shows
+
+
+def make_params(rng):
+    return {
+        'start': dt_time(0, 0), 'end': dt_time(23, 59), 'buffer': rng.choice([0, 10, 15]),
+        'gap_cap': rng.choice([60, 90, 120]), 'unlimited': rng.random() < 0.5, 'fudge': rng.random() < 0.3,
+        'break_after': None, 'long_buffer': 60, 'formats': [], 'theaters': THEATERS, 'primary_code': "T1",
+        'max_per_day': rng.choice([3, 4, 99]),
+    }
+
+
+@pytest.mark.parametrize("rank", ["score", "count"])
+def test_anchored_branch_and_bound_matches_exhaustive_search(rank):
+    drive_map = GridDrive(THEATERS)
+    checked = 0
+    for seed in range(150):
+        rng = random.Random(seed)
+        shows = make_day(seed)
+        graph = engine.DayGraph(shows, "T1", drive_map)
+        p = make_params(rng)
+        anchor = rng.choice(shows)
+        titles = sorted({s.title for s in shows})
+
+        # With k larger than the number of leaves the heap never fills, so nothing is pruned
+        everything = engine.find_top_itineraries(titles, graph, p, SHOW_DAY, drive_map, k=10 ** 9, rank=rank, anchor=anchor)
+        best = engine.find_top_itineraries(titles, graph, p, SHOW_DAY, drive_map, k=1, rank=rank, anchor=anchor)
+
+        assert bool(best) == bool(everything), seed
+        if not everything:
+            continue
+        checked += 1
+
+        def key(path):
+            stats = engine.calculate_path_score(path, "T1", drive_map)
+            return (stats['count'], stats['score']) if rank == "count" else (stats['score'], -stats['gap'])
+
+        assert key(best[0]) == max(map(key, everything)), seed
+        for path in everything:
+            assert anchor in path
+            assert len({s.title for s in path}) == len(path) <= p['max_per_day']
+    assert checked > 50